@@ -9,10 +9,32 @@ from __future__ import annotations
 from typing import Dict, Optional
 import pandas as pd
 import math
+import sys
+
+from timeseries_store import TimeSeriesColumn
+
+
+# shared empty containers of elements without time series or statistics.
+# never written to: an empty container is replaced by the element's own 
+# before a write, so copied or unpickled elements sharing one stay apart
+_NO_ITEMS: dict = {}
+_NO_NAMES: frozenset = frozenset()
+
+
+def _intern(text: Optional[str]) -> Optional[str]:
+    # str() also converts subclasses such as numpy.str_
+    return sys.intern(str(text)) if isinstance(text, str) else text
 
 
 class BaseElement():
     
+    # large configurations hold 100k+ elements, so no instance __dict__
+    __slots__ = (
+        '_element_id', '_element_alias', '_element_type', '_quantity_id',
+        '_chainage', '_hash', '_timeseries', '_statistics', '_stale_stats',
+        '_stats_config',
+    )
+
     CHAINAGE_PRECISION: int = 6
 
     def __init__(
@@ -24,20 +46,38 @@ class BaseElement():
         chainage: float = 0.0,
     ) -> None:
 
-        self._element_id: str = element_id
-        self._element_alias: Optional[str] = element_alias
-        self._element_type: str = element_type.lower()
-        self._quantity_id: Optional[str] = quantity_id
+        # ids repeat across quantities and types, so strings are interned
+        self._element_id: str = _intern(element_id)
+        self._element_alias: Optional[str] = _intern(element_alias)
+        self._element_type: str = _intern(element_type.lower())
+        self._quantity_id: Optional[str] = _intern(quantity_id)
         self._chainage: float = chainage
+        # identity fields are not changed after construction
+        self._hash: int = hash(
+            (
+                self._element_type,
+                self._quantity_id,
+                self._element_id,
+                self._element_alias,
+                round(self._chainage, self.CHAINAGE_PRECISION),
+            )
+        )
 
-        self._timeseries: Dict[str, pd.Series] = {}
-        self._statistics: Dict[str, pd.Series] = {}
+        # ts_name -> column of a shared TimeSeriesBlock
+        self._timeseries: Dict[str, TimeSeriesColumn] = _NO_ITEMS
+        self._statistics: Dict[str, pd.Series] = _NO_ITEMS
+        # ts names added or changed since statistics were last updated
+        self._stale_stats: set[str] = _NO_NAMES
+        # (calculator, stat_names) of the last statistics update
+        self._stats_config: Optional[tuple] = None
 
     # -------------------------
     # Identity
     # -------------------------
 
     def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
         if not isinstance(other, BaseElement):
             return False
         return (
@@ -49,15 +89,7 @@ class BaseElement():
         )
 
     def __hash__(self) -> int:
-        return hash(
-            (
-                self._element_type,
-                self._quantity_id,
-                self._element_id,
-                self._element_alias,
-                round(self._chainage, self.CHAINAGE_PRECISION),
-            )
-        )
+        return self._hash
 
     def __lt__(self, other: object):
         if not isinstance(other, BaseElement):
@@ -104,24 +136,43 @@ class BaseElement():
     # -------------------------
 
     def get_ts(self, ts_name: str) -> Optional[pd.Series]:
-        return self._timeseries.get(ts_name)
+        column = self._timeseries.get(ts_name)
+        return None if column is None else column.get_series()
 
     def get_ts_dataframe(self) -> pd.DataFrame:
         if not self._timeseries:
             return pd.DataFrame()
-        return pd.concat(self._timeseries, axis=1).sort_index()
+        return pd.concat(self.get_ts_dict(), axis=1).sort_index()
 
     def get_ts_dict(self) -> Dict[str, pd.Series]:
-        return self._timeseries.copy()
+        return {
+            ts_name: column.get_series()
+            for ts_name, column in self._timeseries.items()
+        }
+
+    def get_ts_column(self, ts_name: str) -> Optional[TimeSeriesColumn]:
+        return self._timeseries.get(ts_name)
 
     def get_ts_names(self) -> list[str]:
         return list(self._timeseries.keys())
 
     def remove_ts(self, ts_name: str) -> None:
-        self._timeseries.pop(ts_name, None)
+        if self._timeseries:
+            self._timeseries.pop(ts_name, None)
+        if self._stale_stats:
+            self._stale_stats.discard(ts_name)
 
     def reset_ts(self) -> None:
-        self._timeseries.clear()
+        self._timeseries = _NO_ITEMS
+        self._stale_stats = _NO_NAMES
+
+    def _set_ts(self, ts_name: str, column: TimeSeriesColumn) -> None:
+        if not self._timeseries:
+            self._timeseries = {}
+        if not self._stale_stats:
+            self._stale_stats = set()
+        self._timeseries[ts_name] = column
+        self._stale_stats.add(ts_name)
 
     def add_ts(self, *args, **kwargs):
         raise NotImplementedError
@@ -140,7 +191,7 @@ class BaseElement():
         if ts_name in self._statistics and not overwrite:
             raise ValueError(f"Statistics '{ts_name}' already exists")
 
-        self._statistics[ts_name] = stats.copy()
+        self.set_stats(ts_name, stats.copy())
 
     def get_stats(self, ts_name: str) -> Optional[pd.Series]:
         return self._statistics.get(ts_name)
@@ -151,21 +202,70 @@ class BaseElement():
         return pd.concat(self._statistics, axis=1)
 
     def get_stats_dict(self) -> Dict[str, pd.Series]:
-        return self._statistics.copy()
+        return dict(self._statistics)
 
     def remove_stats(self, ts_name: str) -> None:
-        self._statistics.pop(ts_name, None)
+        if self._statistics:
+            self._statistics.pop(ts_name, None)
 
     def reset_stats(self) -> None:
-        self._statistics.clear()
+        self._statistics = _NO_ITEMS
+
+    def update_statistics(
+        self,
+        calculator,
+        recompute: bool = False,
+        stat_names: Optional[tuple] = None
+    ) -> None:
+        """
+        calculator: module or object providing get_all_stats(ts: Series) -> Series,
+        and get_stats(ts, stat_names) if stat_names is given
+        recompute: recalculate statistics of all time series. Otherwise only
+        time series added or changed since the last update are calculated,
+        unless a different calculator or stat_names is given.
+        stat_names: statistics to calculate. None calculates all statistics.
+        """
+        for ts_name in self.get_ts_names_to_update(calculator, recompute, stat_names):
+            ts = self.get_ts(ts_name)
+            if stat_names is None:
+                stats = calculator.get_all_stats(ts)
+            else:
+                stats = calculator.get_stats(ts, stat_names)
+            self.set_stats(ts_name, stats)
+
+        self.mark_statistics_updated(calculator, stat_names)
+
+    def get_ts_names_to_update(
+        self,
+        calculator,
+        recompute: bool = False,
+        stat_names: Optional[tuple] = None
+    ) -> list[str]:
+        """
+        ts names whose statistics are outdated for this calculator and 
+        stat_names
+        """
+        if recompute or self._stats_config != (calculator, stat_names):
+            return list(self._timeseries.keys())
+        return [ts_name for ts_name in self._timeseries
+                if ts_name in self._stale_stats]
 
-    def update_statistics(self, calculator) -> None:
+    def set_stats(self, ts_name: str, stats) -> None:
         """
-        calculator: module or object providing get_all_stats(ts: Series) -> Series
+        store statistics calculated outside the element, e.g. for a block
+        of elements at once
         """
-        for ts_name, ts in self._timeseries.items():
-            stats = calculator.get_all_stats(ts)
-            self._statistics[ts_name] = stats
+        if not self._statistics:
+            self._statistics = {}
+        self._statistics[ts_name] = stats
+
+    def mark_statistics_updated(
+        self,
+        calculator,
+        stat_names: Optional[tuple] = None
+    ) -> None:
+        self._stale_stats = _NO_NAMES
+        self._stats_config = (calculator, stat_names)
 
     # -------------------------
     # String
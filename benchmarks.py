@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Author: Yi Wang
+# this module holds micro-benchmarks for performance sensitive code paths
+# run "python benchmarks.py" to print timings of all benchmarks
+
+import math
+import os
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+def _best_time(func, repeat=3):
+    """
+    returns the best wall time in seconds of several runs of func
+    """
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _print_timings(title, timings):
+    print(title)
+    for name, seconds in timings.items():
+        print(f'    {name:<24}{seconds * 1000:12.2f} ms')
+
+
+def benchmark_dotnet_array_transfer(rows=100000, columns=20, repeat=3):
+    """
+    compare bulk memory transfer of .NET arrays with element-by-element
+    pythonnet conversion, for synthetic float[] and float[,] arrays.
+
+    Parameters
+    ----------
+    rows : int, optional
+        number of time steps. The default is 100000.
+    columns : int, optional
+        number of gridpoints of the 2-D array. The default is 20.
+    repeat : int, optional
+        number of runs per path. The default is 3.
+
+    Returns
+    -------
+    dict
+        best times in seconds, keyed by path name.
+
+    """
+    import res1d
+    from System import Array, Single
+
+    values = np.random.default_rng(0).random(rows).astype(np.float32)
+    array_1d = Array[Single]([float(v) for v in values])
+    array_2d = Array.CreateInstance(Single, rows, columns)
+    for k in range(rows):
+        array_2d.SetValue(Single(float(values[k])), k, k % columns)
+
+    for array in [array_1d, array_2d]:
+        if not np.array_equal(res1d._dotnet_array_to_numpy(array),
+                              np.asarray(array, dtype=np.float32)):
+            raise AssertionError('bulk transfer does not match pythonnet')
+
+    timings = {
+        'bulk float[]': _best_time(
+            lambda: res1d._dotnet_array_to_numpy(array_1d), repeat),
+        'pythonnet float[]': _best_time(
+            lambda: np.asarray(array_1d), repeat),
+        'bulk float[,]': _best_time(
+            lambda: res1d._dotnet_array_to_numpy(array_2d), repeat),
+        'pythonnet float[,]': _best_time(
+            lambda: np.asarray(array_2d), repeat),
+    }
+    _print_timings(
+        f'.NET array transfer, {rows} x {columns}:', timings)
+    return timings
+
+
+def _integral_block_resample(s, window='1h'):
+    """
+    integral_block before vectorization, kept as benchmark reference
+    """
+    original_index = s.index
+    s_index = s.reset_index(level=0)
+    s_index = s_index - s_index.shift(1)
+    s_index = s_index.iloc[:, 0].apply(lambda x: x.total_seconds())
+    s = (s + s.shift(1))/2
+    s = s.reset_index(drop=True)
+    s = s.multiply(s_index, fill_value=0)
+    s.index = original_index
+    s = s.resample(window, closed = 'right').sum()
+    return s.iloc[1:]
+
+
+def _integral_stats_resample(s):
+    return {
+        'integral': _integral_block_resample(s).sum(),
+        'positive_duration': _integral_block_resample(
+            s.map(lambda x: 1 if x > 0 else 0)).sum(),
+        'negative_duration': _integral_block_resample(
+            s.map(lambda x: 1 if x < 0 else 0)).sum(),
+    }
+
+
+def benchmark_integral(steps=1000000, repeat=3):
+    """
+    compare the NumPy trapezoid integral and durations with the previous
+    apply/shift/resample implementation on a synthetic series.
+
+    Parameters
+    ----------
+    steps : int, optional
+        number of time steps. The default is 1000000.
+    repeat : int, optional
+        number of runs per path. The default is 3.
+
+    Returns
+    -------
+    dict
+        best times in seconds, keyed by path name.
+
+    """
+    import statistics_calculator
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01 00:00:30', periods=steps, freq='5s')
+    s = pd.Series(rng.normal(size=steps).astype(np.float32), index=index)
+
+    expected = _integral_stats_resample(s)
+    result = statistics_calculator.integral_stats(s)
+    for name, value in expected.items():
+        if not np.isclose(result[name], value, rtol=1e-5):
+            raise AssertionError(f'{name} does not match resample version')
+    # the resample version averages float32 values in float32
+    if not np.allclose(statistics_calculator.integral_block(s, '15min'),
+                       _integral_block_resample(s, '15min'), atol=1e-3):
+        raise AssertionError('integral_block does not match resample version')
+
+    timings = {
+        'resample integral': _best_time(
+            lambda: _integral_block_resample(s).sum(), repeat),
+        'numpy integral': _best_time(
+            lambda: statistics_calculator.integral(s), repeat),
+        'resample integral+dur': _best_time(
+            lambda: _integral_stats_resample(s), repeat),
+        'numpy integral+dur': _best_time(
+            lambda: statistics_calculator.integral_stats(s), repeat),
+        'resample 15min blocks': _best_time(
+            lambda: _integral_block_resample(s, '15min'), repeat),
+        'numpy 15min blocks': _best_time(
+            lambda: statistics_calculator.integral_block(s, '15min'), repeat),
+    }
+    _print_timings(f'integral and durations, {steps} steps:', timings)
+    return timings
+
+
+def _update_combined_ts_aligned(elements, ts_name):
+    """
+    update_combined_ts without the shared index fast path, kept as 
+    benchmark reference: target index is built and every component aligned
+    """
+    import combined_element
+
+    targets = {}
+    groups = {}
+    for element in elements:
+        terms = element.get_terms(ts_name)
+        series_list = [column.get_series() for _, _, column in terms]
+        key = frozenset(id(ts.index) for ts in series_list)
+        if key not in targets:
+            targets[key] = element._build_target_index(series_list)
+        groups.setdefault(id(targets[key]), (targets[key], []))[1].append(
+            (element, terms))
+    for target, group in groups.values():
+        combined_element._evaluate_combined_group(target, group, ts_name)
+
+
+def benchmark_combined(elements=500, components=2000, terms=5, steps=10000,
+                       repeat=3):
+    """
+    compare combined element evaluation with components sharing one time
+    index (alignment skipped) against the general alignment path.
+
+    Parameters
+    ----------
+    elements : int, optional
+        number of combined elements. The default is 500.
+    components : int, optional
+        number of component elements. The default is 2000.
+    terms : int, optional
+        number of terms per combined element. The default is 5.
+    steps : int, optional
+        number of time steps. The default is 10000.
+    repeat : int, optional
+        number of runs per path. The default is 3.
+
+    Returns
+    -------
+    dict
+        best times in seconds, keyed by path name.
+
+    """
+    import combined_element
+    import simple_element
+    from timeseries_store import TimeSeriesBlock
+
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2020-01-01', periods=steps, freq='1min')
+    block = TimeSeriesBlock(
+        rng.random((steps, components)).astype(np.float32), index)
+    sources = []
+    for k in range(components):
+        element = simple_element.SimpleElement(
+            f'L{k}', f'L{k}', 'link', 'Discharge')
+        element.add_ts_column('f1', block, k)
+        sources.append(element)
+
+    combined = []
+    for k in range(elements):
+        element = combined_element.CombinedElement(f'C{k}')
+        for source in rng.choice(components, terms, replace=False):
+            element.add_element(sources[source], 1 if rng.random() < 0.7 else -1)
+        combined.append(element)
+
+    combined_element.update_combined_ts(combined)
+    expected = [element.get_ts('f1').to_numpy() for element in combined]
+    _update_combined_ts_aligned(combined, 'f1')
+    for element, values in zip(combined, expected):
+        if not np.allclose(element.get_ts('f1').to_numpy(), values):
+            raise AssertionError('shared index path does not match alignment')
+
+    timings = {
+        'aligned': _best_time(
+            lambda: _update_combined_ts_aligned(combined, 'f1'), repeat),
+        'shared index': _best_time(
+            lambda: combined_element.update_combined_ts(combined), repeat),
+    }
+    _print_timings(
+        f'combined elements, {elements} x {terms} terms, {steps} steps:',
+        timings)
+    return timings
+
+
+class _ElementBefore:
+    """
+    element layout before __slots__, kept as benchmark reference: instance
+    __dict__, own containers per element and the hash rebuilt on every call
+    """
+
+    def __init__(self, element_id, element_alias, element_type, quantity_id,
+                 chainage=0.0):
+        self._element_id = element_id
+        self._element_alias = element_alias
+        self._element_type = element_type.lower()
+        self._quantity_id = quantity_id
+        self._chainage = chainage
+        self._timeseries = {}
+        self._statistics = {}
+        self._stale_stats = set()
+        self._stats_config = None
+
+    def __eq__(self, other):
+        if not isinstance(other, _ElementBefore):
+            return False
+        return (
+            self._element_id == other._element_id
+            and self._element_alias == other._element_alias
+            and self._element_type == other._element_type
+            and self._quantity_id == other._quantity_id
+            and math.isclose(self._chainage, other._chainage)
+        )
+
+    def __hash__(self):
+        return hash((self._element_type, self._quantity_id, self._element_id,
+                     self._element_alias, round(self._chainage, 6)))
+
+
+def _create_synthetic_elements(element_class, elements):
+    quantities = ['Discharge', 'WaterLevel']
+    return [element_class(f'L{k // 2}', f'a{k}', 'Link',
+                          quantities[k % 2], float(k % 7))
+            for k in range(elements)]
+
+
+def _check_element_copies(elements):
+    """
+    raise AssertionError if copied or unpickled elements share time series
+    or statistics
+    """
+    import copy
+    import pickle
+
+    import pandas as pd
+
+    ts = pd.Series([1.0, 2.0], index=pd.date_range('2020-01-01', periods=2))
+    for name, copied in [('deepcopy', copy.deepcopy(elements[:2])),
+                         ('pickle', pickle.loads(pickle.dumps(elements[:2])))]:
+        first, second = copied
+        first.add_ts('ts', ts)
+        first.set_stats('ts', {'max': 2.0})
+        if (first != elements[0] or second.get_ts_names()
+                or second.get_stats_dict()):
+            raise AssertionError(f'{name} elements share their containers')
+
+
+def _get_allocated_bytes(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_elements(elements=100000, repeat=3):
+    """
+    compare memory and hash lookups of the __slots__ element model with 
+    the previous element layout, for a synthetic configuration.
+
+    Parameters
+    ----------
+    elements : int, optional
+        number of elements. The default is 100000.
+    repeat : int, optional
+        number of runs per path. The default is 3.
+
+    Returns
+    -------
+    dict
+        bytes allocated per element and best lookup times in seconds, keyed
+        by path name.
+
+    """
+    import simple_element
+
+    results = {}
+    timings = {}
+    for name, element_class in [('before', _ElementBefore),
+                                ('slots', simple_element.SimpleElement)]:
+        allocated, created = _get_allocated_bytes(
+            lambda: _create_synthetic_elements(element_class, elements))
+        lookup = {element: element for element in created}
+        probes = _create_synthetic_elements(element_class, elements)
+        if not all(probe in lookup for probe in probes):
+            raise AssertionError(f'{name} elements are not found by equality')
+        if element_class is simple_element.SimpleElement:
+            _check_element_copies(created)
+
+        results[f'{name} bytes/element'] = allocated / elements
+        timings[f'{name} lookups'] = _best_time(
+            lambda: [lookup[probe] for probe in probes], repeat)
+        timings[f'{name} dict build'] = _best_time(
+            lambda: {element: element for element in created}, repeat)
+
+    _print_timings(f'elements, {elements} synthetic elements:', timings)
+    for name, value in results.items():
+        print(f'    {name:<24}{value:12.0f} B')
+    results.update(timings)
+    return results
+
+
+def _read_dataframes_per_reader(xlsx_file_path):
+    """
+    read_dataframes_from_xlsx before the single-open reader, kept as 
+    benchmark reference: every reader opens and parses the workbook
+    """
+    import input_xlsx
+
+    element_dtypes = {'alias': object, 'quantity': object, 'muid': object,
+                      'chainage': np.float64}
+    res1d_file_dfs = pd.read_excel(
+        xlsx_file_path, sheet_name=['res1d_files'], dtype={
+            'result_type': object, 'short_name': object,
+            'res1d_file_path': object})
+    element_collections_dfs = {}
+    with pd.ExcelFile(xlsx_file_path) as workbook:
+        for sheet_name in input_xlsx.ELEMENT_SHEETS:
+            element_collections_dfs[sheet_name] = pd.read_excel(
+                workbook, sheet_name=sheet_name, dtype=element_dtypes)
+    output_files_dfs = pd.read_excel(
+        xlsx_file_path, sheet_name=['output_files'],
+        dtype={'type': object, 'value': object})
+    combined_df = pd.read_excel(
+        xlsx_file_path, sheet_name='combined', dtype={
+            'combined_alias': object, 'quantity': object, 'op': object,
+            'source': object, 'source_alias': object})
+    return [res1d_file_dfs, element_collections_dfs, output_files_dfs,
+            combined_df]
+
+
+def _write_synthetic_config(xlsx_file_path, rows):
+    import input_dataframes
+    import input_xlsx
+
+    dfs = input_dataframes.create_element_collections_dataframes_template()
+    dfs = dfs | input_dataframes.create_res1d_files_dataframe_template()
+    dfs = dfs | input_dataframes.create_output_files_dataframe_template()
+    dfs = dfs | input_dataframes.create_combined_dataframe_template()
+    dfs['node'] = pd.DataFrame({
+        'alias': [f'N{k}_WaterLevel' if k % 3 else None for k in range(rows)],
+        'quantity': ['WaterLevel'] * rows,
+        'muid': [f'N{k}' for k in range(rows)]})
+    dfs['link'] = pd.DataFrame({
+        'alias': [f'L{k}_Discharge' if k % 3 else None for k in range(rows)],
+        'quantity': ['Discharge'] * rows,
+        'muid': [f'L{k}' for k in range(rows)],
+        'chainage': [float(k % 50) if k % 4 else None for k in range(rows)]})
+    input_xlsx.write_dataframes_to_xlxs(xlsx_file_path, dfs)
+
+
+def benchmark_xlsx_load(rows=100000, repeat=1):
+    """
+    compare loading a configuration workbook in one read-only pass with
+    opening it once per reader, for synthetic node and link sheets.
+
+    Parameters
+    ----------
+    rows : int, optional
+        number of rows of the node and link sheets. The default is 100000.
+    repeat : int, optional
+        number of runs per path. The default is 1.
+
+    Returns
+    -------
+    dict
+        best times in seconds, keyed by path name.
+
+    """
+    import input_xlsx
+
+    with tempfile.TemporaryDirectory() as folder:
+        xlsx_file_path = os.path.join(folder, 'config.xlsx')
+        _write_synthetic_config(xlsx_file_path, rows)
+
+        expected = _read_dataframes_per_reader(xlsx_file_path)[1]
+        result = input_xlsx.read_dataframes_from_xlsx(xlsx_file_path)[1]
+        for sheet_name, df in expected.items():
+            pd.testing.assert_frame_equal(result[sheet_name], df)
+
+        timings = {
+            'read_excel per reader': _best_time(
+                lambda: _read_dataframes_per_reader(xlsx_file_path), repeat),
+            'single open': _best_time(
+                lambda: input_xlsx.read_dataframes_from_xlsx(xlsx_file_path),
+                repeat),
+        }
+    _print_timings(f'xlsx configuration, {rows} rows per sheet:', timings)
+    return timings
+
+
+def main():
+    print("in benchmarks.py!")
+    benchmark_integral()
+    benchmark_combined()
+    benchmark_elements()
+    benchmark_xlsx_load()
+    benchmark_dotnet_array_transfer()
+
+
+if __name__ == '__main__':
+    main()
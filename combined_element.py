@@ -9,10 +9,12 @@
 from __future__ import annotations
 
 from typing import Dict, Optional, List
+import numpy as np
 import pandas as pd
 import warnings
 
 from base_element import BaseElement
+from timeseries_store import TimeSeriesBlock, TimeSeriesColumn
 import statistics_calculator
 
 
@@ -21,6 +23,11 @@ CALCULATED_DISCHARGE = "CalculatedDischarge"
 
 class CombinedElement(BaseElement):
     
+    __slots__ = (
+        '_positive_elements', '_negative_elements', '_fill_outside',
+        '_interpolation_method',
+    )
+
     def __init__(
         self, 
         name: str, 
@@ -93,50 +100,32 @@ class CombinedElement(BaseElement):
         """
         Compute time series from component elements.
         """
+        update_combined_ts([self])
 
-        ts_names = set()
-
-        for e in self.get_elements():
-            ts_names.update(e.get_ts_names())
-
-        for ts_name in ts_names:
-
-            pos_series: List[pd.Series] = []
-            neg_series: List[pd.Series] = []
-            missing: List[BaseElement] = []
-
-            # positive elements
-            for e in self._positive_elements:
-                ts = e.get_ts(ts_name)
-                if ts is None:
-                    missing.append(e)
-                else:
-                    pos_series.append(ts)
-
-            # negative elements
-            for e in self._negative_elements:
-                ts = e.get_ts(ts_name)
-                if ts is None:
+    def get_terms(self, ts_name: str) -> List[tuple[BaseElement, int, TimeSeriesColumn]]:
+        """
+        (element, sign, time series column) of component elements having 
+        ts_name. warns about component elements without ts_name.
+        """
+        terms = []
+        missing: List[BaseElement] = []
+
+        for elements, sign in [(self._positive_elements, 1),
+                               (self._negative_elements, -1)]:
+            for e in elements:
+                column = e.get_ts_column(ts_name)
+                if column is None:
                     missing.append(e)
                 else:
-                    neg_series.append(ts)
-
-            # warning if missing
-            if missing:
-                warnings.warn(
-                    f"CombinedElement '{self._element_id}': "
-                    f"missing timeseries '{ts_name}' for {len(missing)} element(s)"
-                )
-
-            if not pos_series and not neg_series:
-                return 
-                        
-            aligned_pos, aligned_neg = self._prepare_series(pos_series, neg_series)
-            
-            result = self._compute_result(aligned_pos, aligned_neg)
+                    terms.append((e, sign, column))
 
-            if result is not None:
-                self._timeseries[ts_name] = result
+        # warning if missing
+        if missing:
+            warnings.warn(
+                f"CombinedElement '{self._element_id}': "
+                f"missing timeseries '{ts_name}' for {len(missing)} element(s)"
+            )
+        return terms
 
     def add_ts(self, *args, **kwargs):
         """
@@ -152,8 +141,14 @@ class CombinedElement(BaseElement):
     # Statistics (reuse base)
     # -------------------------
 
-    def update_statistics(self, calculator=None) -> None:
-        super().update_statistics(calculator or statistics_calculator)
+    def update_statistics(
+        self,
+        calculator=None,
+        recompute: bool = False,
+        stat_names: Optional[tuple] = None
+    ) -> None:
+        super().update_statistics(
+            calculator or statistics_calculator, recompute, stat_names)
 
     # -------------------------
     # String
@@ -243,50 +238,235 @@ class CombinedElement(BaseElement):
             s2[outside_mask] = fill_outside
     
         return s2
-    
-    def _prepare_series(
-        self,
-        pos_series: List[pd.Series],
-        neg_series: List[pd.Series],
-    ) -> tuple[List[pd.Series], List[pd.Series]]:
-    
-        series_list = pos_series + neg_series
-        if not series_list:
-            return [], []
-    
-        target_index = self._build_target_index(series_list)
-    
-        aligned_pos = [self._align_series(s, target_index, self._fill_outside) for s in pos_series]
-        aligned_neg = [self._align_series(s, target_index, self._fill_outside) for s in neg_series]
-    
-        return aligned_pos, aligned_neg
 
-    def _sum_series(self, series_list: List[pd.Series]) -> Optional[pd.Series]:
-        if not series_list:
+
+def update_combined_ts(elements: List[CombinedElement]) -> None:
+    """
+    Compute time series of many combined elements together. For each ts 
+    name, combined elements sharing a target index are evaluated at once:
+    aligned component columns are stacked into one matrix and multiplied by
+    a signed (+1/-1) coefficient matrix with one column per combined element.
+    Results are stored in one TimeSeriesBlock per target index.
+    Combined elements used as terms of other combined elements are 
+    evaluated first, once, level by level of the dependency graph.
+    """
+    for level in get_evaluation_levels(elements):
+        # ts names in order of first appearance
+        ts_names: Dict[str, None] = {}
+        for element in level:
+            for e in element.get_elements():
+                ts_names.update(dict.fromkeys(e.get_ts_names()))
+
+        for ts_name in ts_names:
+            _update_combined_ts_name(level, ts_name)
+
+
+def get_evaluation_levels(elements: List[CombinedElement]) -> List[List[CombinedElement]]:
+    """
+    Group combined elements and the combined elements they use as terms by
+    dependency depth. Level 0 uses only simple elements, level k uses 
+    combined elements of lower levels. Raises ValueError on cycles.
+    """
+    levels_of: Dict[CombinedElement, int] = {}
+    # combined elements on the current dependency path
+    path: List[CombinedElement] = []
+
+    def visit(element: CombinedElement) -> int:
+        if element in levels_of:
+            return levels_of[element]
+        if element in path:
+            cycle = path[path.index(element):] + [element]
+            raise ValueError(
+                "Cycle in combined elements: "
+                + " -> ".join(e.get_element_id() for e in cycle)
+            )
+        path.append(element)
+        level = 0
+        for e in element.get_elements():
+            if isinstance(e, CombinedElement):
+                level = max(level, visit(e) + 1)
+        path.pop()
+        levels_of[element] = level
+        return level
+
+    for element in elements:
+        visit(element)
+
+    levels: List[List[CombinedElement]] = [
+        [] for _ in range(max(levels_of.values(), default=-1) + 1)
+    ]
+    for element, level in levels_of.items():
+        levels[level].append(element)
+    return levels
+
+
+def _update_combined_ts_name(elements: List[CombinedElement], ts_name: str) -> None:
+    # component index ids -> (target index, shared), as building it is expensive
+    targets: Dict[frozenset, tuple[pd.Index, bool]] = {}
+    # (id(target), shared, interpolation, fill) -> (target, shared, [(element, terms)])
+    groups: Dict[tuple, tuple[pd.Index, bool, list]] = {}
+
+    for element in elements:
+        terms = element.get_terms(ts_name)
+        if not terms:
+            continue
+        indexes = [column.get_block().get_index() for _, _, column in terms]
+        key = frozenset(id(index) for index in indexes)
+        if key not in targets:
+            shared_index = _get_shared_index(indexes)
+            if shared_index is None:
+                series_list = [column.get_series() for _, _, column in terms]
+                targets[key] = (element._build_target_index(series_list), False)
+            else:
+                targets[key] = (shared_index, True)
+        target, shared = targets[key]
+        group_key = (id(target), shared, element._interpolation_method,
+                     element._fill_outside)
+        groups.setdefault(group_key, (target, shared, []))[2].append((element, terms))
+
+    for target, shared, group in groups.values():
+        _evaluate_combined_group(target, group, ts_name, shared)
+
+
+def _get_shared_index(indexes: List[pd.Index]) -> Optional[pd.Index]:
+    """
+    the index if all indexes are equal, e.g. columns of the same res1d 
+    file, otherwise None. identical index objects are not compared.
+    """
+    index = indexes[0]
+    for other in indexes[1:]:
+        if other is not index and not other.equals(index):
             return None
-    
-        result = series_list[0]
-        for s in series_list[1:]:
-            result = result.add(s, fill_value=0)
-    
+    return index
+
+
+def _evaluate_combined_group(
+    target: pd.Index,
+    group: List[tuple[CombinedElement, list]],
+    ts_name: str,
+    shared: bool = False
+) -> None:
+    """
+    evaluate combined elements of one target index as 
+    values (time x component) @ coefficients (component x element), with
+    a sparse signed (+1/-1) coefficient matrix given as term lists.
+    shared: components already share the target index. they are used as 
+    they are, only components with missing values are interpolated.
+    """
+    # component element -> column in values
+    columns: Dict[BaseElement, int] = {}
+    components: List[tuple[CombinedElement, TimeSeriesColumn]] = []
+    # one entry per term: component column, element column, sign
+    rows: List[int] = []
+    cols: List[int] = []
+    signs: List[int] = []
+
+    for j, (element, terms) in enumerate(group):
+        for e, sign, column in terms:
+            if e not in columns:
+                columns[e] = len(components)
+                components.append((element, column))
+            rows.append(columns[e])
+            cols.append(j)
+            signs.append(sign)
+
+    # component x time, so terms are gathered and summed as whole rows.
+    # same dtype as the components, e.g. float32 from res1d files
+    dtype = np.result_type(
+        np.float32, *[column.get_block().get_values().dtype for _, column in components])
+    values = _stack_components(components, target, shared, dtype)
+    rows = np.asarray(rows)
+    cols = np.asarray(cols)
+    signs = np.asarray(signs)
+
+    valid = ~np.isnan(values)
+    if valid.all():
+        result = _signed_sum(values, rows, cols, signs, len(group))
+    else:
+        # missing values count as zero, unless all positive or all
+        # negative terms are missing at a time step
+        result = _signed_sum(
+            np.where(valid, values, 0), rows, cols, signs, len(group))
+        valid = valid.astype(dtype)
+        for term_mask in [signs > 0, signs < 0]:
+            has_terms = np.bincount(cols[term_mask], minlength=len(group)) > 0
+            counts = _signed_sum(valid, rows[term_mask], cols[term_mask],
+                                 signs[term_mask] ** 2, len(group))
+            result[(counts == 0) & has_terms[:, None]] = np.nan
+
+    # time x element view, each element column is contiguous
+    block = TimeSeriesBlock(
+        result.T,
+        target,
+        pd.Index([element.get_element_id() for element, _ in group])
+    )
+    for j, (element, _) in enumerate(group):
+        element._set_ts(ts_name, TimeSeriesColumn(block, j))
+
+
+def _stack_components(
+    components: List[tuple[CombinedElement, TimeSeriesColumn]],
+    target: pd.Index,
+    shared: bool,
+    dtype: np.dtype
+) -> np.ndarray:
+    """
+    (component x time) matrix of component time series aligned to target.
+    with a shared index, columns of the same block are copied in one step.
+    """
+    values = np.empty((len(components), len(target)), dtype=dtype)
+
+    if shared:
+        # id(block) -> (block, [component position], [block column])
+        blocks: Dict[int, tuple[TimeSeriesBlock, list, list]] = {}
+        for k, (_, column) in enumerate(components):
+            block = column.get_block()
+            item = blocks.setdefault(id(block), (block, [], []))
+            item[1].append(k)
+            item[2].append(column.get_column())
+        for block, positions, block_columns in blocks.values():
+            values[positions] = block.get_values().T[block_columns]
+        to_align = np.flatnonzero(np.isnan(values).any(axis=1))
+    else:
+        to_align = range(len(components))
+
+    for k in to_align:
+        element, column = components[k]
+        s = element._align_series(
+            column.get_series(), target, element._fill_outside)
+        values[k] = s.to_numpy(dtype=dtype, na_value=np.nan)
+    return values
+
+
+def _signed_sum(
+    values: np.ndarray,
+    rows: np.ndarray,
+    cols: np.ndarray,
+    signs: np.ndarray,
+    n_cols: int
+) -> np.ndarray:
+    """
+    C.T @ values for the sparse coefficient matrix C[rows, cols] = signs 
+    (+1/-1), with values as (component x time). returns (element x time).
+    terms are added slot by slot: the k-th term of every element at once.
+    """
+    result = np.zeros((n_cols, values.shape[1]), dtype=values.dtype)
+    if len(rows) == 0:
         return result
-    
-    def _compute_result(
-        self,
-        pos_series: List[pd.Series],
-        neg_series: List[pd.Series],
-    ) -> Optional[pd.Series]:
-    
-        pos_result = self._sum_series(pos_series)
-        neg_result = self._sum_series(neg_series)
-    
-        if pos_result is None and neg_result is None:
-            return None
-    
-        if pos_result is None:
-            return -neg_result
-    
-        if neg_result is None:
-            return pos_result
-    
-        return pos_result - neg_result
+
+    order = np.argsort(cols, kind='stable')
+    rows = rows[order]
+    cols = cols[order]
+    signs = signs[order]
+    starts = np.flatnonzero(np.r_[True, cols[1:] != cols[:-1]])
+    slots = np.arange(len(cols)) - np.repeat(starts, np.diff(np.r_[starts, len(cols)]))
+
+    for slot in range(slots.max() + 1):
+        in_slot = slots == slot
+        for sign, op in [(1, np.add), (-1, np.subtract)]:
+            selected = in_slot & (signs == sign)
+            if selected.any():
+                # elements are unique within a slot
+                targets = cols[selected]
+                result[targets] = op(result[targets], values[rows[selected]])
+    return result
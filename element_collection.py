@@ -6,14 +6,17 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
 import pandas as pd
 import os
 import warnings
 
 from base_element import BaseElement
+from timeseries_store import TimeSeriesBlock
 import combined_element
 import simple_element
+import statistics_calculator
 
 
 ElementDataFrames = Dict[str, pd.DataFrame]
@@ -29,6 +32,16 @@ class ElementCollection:
         self._element_type: str = element_type
         # quantity_id -> {element: element}
         self._quantities: Dict[str, Dict[BaseElement, BaseElement]] = {}
+        # secondary indexes, maintained by add_element
+        self._by_quantity_and_id: Dict[tuple[str, str], List[BaseElement]] = {}
+        self._by_alias: Dict[str, List[BaseElement]] = {}
+        self._by_id: Dict[str, List[BaseElement]] = {}
+        # quantity_id (None for all) -> sorted element ids, cleared on mutation
+        self._id_cache: Dict[Optional[str], List[str]] = {}
+        # quantity_id -> (columns, column position per element), see add_ts
+        self._column_plans: Dict[str, tuple[pd.Index, np.ndarray]] = {}
+        # selector -> statistic names, see statistics_calculator.select_stat_names
+        self._stats_selection: Optional[Dict[Optional[str], List[str]]] = None
 
     # -------------------------
     # Element management
@@ -46,7 +59,18 @@ class ElementCollection:
         if quantity_id not in self._quantities:
             self._quantities[quantity_id] = {}
 
-        self._quantities[quantity_id][element] = element
+        elements = self._quantities[quantity_id]
+        # an equal element is replaced
+        if element in elements:
+            self._unindex_element(elements[element])
+        elements[element] = element
+        self._index_element(element)
+        self._id_cache.clear()
+        self._column_plans.clear()
+
+    def add_elements(self, elements: Iterable[BaseElement]) -> None:
+        for element in elements:
+            self.add_element(element)
 
     def get_element_type(self) -> str:
         return self._element_type
@@ -56,16 +80,28 @@ class ElementCollection:
     # -------------------------
 
     def get_all_element_ids(self) -> List[str]:
-        ids: set[str] = set()
-
-        for elements in self._quantities.values():
-            ids.update(e.get_element_id() for e in elements.values())
-
-        return sorted(ids)
+        if None not in self._id_cache:
+            self._id_cache[None] = sorted(self._by_id)
+        return list(self._id_cache[None])
 
     def get_element_ids_by_quantity(self, quantity_id: str) -> List[str]:
-        elements = self._quantities.get(quantity_id, {})
-        return sorted(set(e.get_element_id() for e in elements.values()))
+        if quantity_id not in self._id_cache:
+            elements = self._quantities.get(quantity_id, {})
+            self._id_cache[quantity_id] = sorted(
+                set(e.get_element_id() for e in elements.values()))
+        return list(self._id_cache[quantity_id])
+
+    def get_element_chainages(self) -> Dict[str, List[float]]:
+        """
+        element_id -> sorted chainages of its elements, over all quantities.
+        readers extract only the gridpoints nearest to these chainages.
+        """
+        chainages: Dict[str, set[float]] = {}
+        for element in self.iter_elements():
+            chainages.setdefault(element.get_element_id(), set()).add(
+                float(element.get_chainage()))
+        return {element_id: sorted(values)
+                for element_id, values in chainages.items()}
 
     # -------------------------
     # Query - elements
@@ -86,10 +122,13 @@ class ElementCollection:
         element_id: str
     ) -> List[BaseElement]:
 
-        return [
-            e for e in self.get_elements_by_quantity(quantity_id)
-            if e.get_element_id() == element_id
-        ]
+        return list(self._by_quantity_and_id.get((quantity_id, element_id), []))
+
+    def get_elements_by_id(self, element_id: str) -> List[BaseElement]:
+        return list(self._by_id.get(element_id, []))
+
+    def get_elements_by_alias(self, alias: str) -> List[BaseElement]:
+        return list(self._by_alias.get(alias, []))
 
     def get_quantity_ids(self) -> List[str]:
         return list(self._quantities.keys())
@@ -133,9 +172,8 @@ class ElementCollection:
         if element_df.empty:
             return collection
 
-        element_df = element_df.fillna(0)
-        for _, row in element_df.iterrows():
-            collection.add_element(cls._row_to_simple_element(element_type, row))
+        collection.add_elements(
+            cls._dataframe_to_simple_elements(element_type, element_df))
 
         return collection
 
@@ -151,19 +189,22 @@ class ElementCollection:
             return combined_collection
 
         alias_lookup = cls._create_element_alias_lookup(element_collections)
+        # terms with source "combined" refer to other combined aliases
+        alias_lookup["combined"] = {}
 
         for item in combined:
             alias = item.get("alias")
             if not alias:
                 raise ValueError("Combined item missing alias")
-            if combined_collection.get_elements_by_quantity_and_id(
-                    combined_element.CALCULATED_DISCHARGE,
-                    alias):
+            if alias in alias_lookup["combined"]:
                 raise ValueError(f"Duplicate combined alias: {alias}")
             if not item.get("terms"):
                 raise ValueError(f"Combined element '{alias}' has no terms")
+            alias_lookup["combined"][alias] = combined_element.CombinedElement(alias)
 
-            element = combined_element.CombinedElement(alias)
+        for item in combined:
+            alias = item.get("alias")
+            element = alias_lookup["combined"][alias]
             seen_terms: set[tuple[str, Optional[str]]] = set()
 
             for term in item.get("terms", []):
@@ -191,6 +232,9 @@ class ElementCollection:
 
             combined_collection.add_element(element)
 
+        # raises ValueError on cycles
+        combined_element.get_evaluation_levels(combined_collection.get_all_elements())
+
         return combined_collection
 
     # -------------------------
@@ -201,6 +245,10 @@ class ElementCollection:
         """
         add time series from raw dataframes.
         Only applicable to elements that support external data injection.
+        the columns of the elements are stored once as a shared 
+        TimeSeriesBlock and elements keep a column reference into it.
+        the column of each element is resolved once per quantity and column
+        layout, later files with the same columns reuse it.
         """
 
         if not isinstance(dfs, dict):
@@ -217,12 +265,25 @@ class ElementCollection:
             if quantity_id not in self._quantities:
                 continue
 
-            for element in self._quantities[quantity_id].values():
-
-                col = self._find_column_in_dataframe(element, df)
+            positions = self._get_column_plan(quantity_id, df.columns)
+            found = np.flatnonzero(positions >= 0)
+            if len(found) == 0:
+                continue
 
-                if col is not None:
-                    element.add_ts(filename, df[col])
+            # keep only the columns used by elements in the block
+            used, columns = np.unique(positions[found], return_inverse=True)
+            if len(used) == df.shape[1]:
+                block = TimeSeriesBlock.from_frame(df)
+            else:
+                block = TimeSeriesBlock.from_frame(df.iloc[:, used])
+
+            elements = self.get_elements_by_quantity(quantity_id)
+            for k, column in zip(found, columns):
+                element = elements[k]
+                if hasattr(element, "add_ts_column"):
+                    element.add_ts_column(filename, block, int(column))
+                else:
+                    element.add_ts(filename, block.get_series(int(column)))
 
     # -------------------------
     # Update derived elements (CombinedElement)
@@ -230,19 +291,89 @@ class ElementCollection:
 
     def update_ts(self) -> None:
         """
-        Call update_ts() for combined elements that compute their own time series.
+        Call update_ts() for elements that compute their own time series.
+        combined elements are evaluated together, see 
+        combined_element.update_combined_ts.
         """
-
+        combined = []
         for element in self.get_all_elements():
-            element.update_ts()
+            if isinstance(element, combined_element.CombinedElement):
+                combined.append(element)
+            else:
+                element.update_ts()
+
+        if combined:
+            combined_element.update_combined_ts(combined)
 
     # -------------------------
     # Statistics
     # -------------------------
 
-    def update_statistics(self, calculator: Optional[Any] = None) -> None:
+    def set_stats_selection(
+        self,
+        selection: Optional[Dict[Optional[str], List[str]]]
+    ) -> None:
+        """
+        select statistics per element type or quantity, e.g.
+        {None: ['max'], 'Discharge': ['max', 'integral']}.
+        None selects all statistics.
+        """
+        if selection:
+            for stat_names in selection.values():
+                if stat_names is not None:
+                    statistics_calculator.validate_stat_names(stat_names)
+        self._stats_selection = selection
+
+    def get_stats_selection(self) -> Optional[Dict[Optional[str], List[str]]]:
+        return self._stats_selection
+
+    def get_stat_names(self, element: BaseElement) -> Optional[tuple]:
+        """
+        statistics selected for the element, None for all statistics
+        """
+        return statistics_calculator.select_stat_names(
+            self._stats_selection,
+            element.get_element_type(),
+            element.get_quantity_id()
+        )
+
+    def update_statistics(
+        self,
+        calculator: Optional[Any] = None,
+        recompute: bool = False
+    ) -> None:
+        """
+        calculate the selected statistics of time series added or changed 
+        since the last update. use recompute=True to recalculate all 
+        statistics. with the default calculator, time series sharing a time 
+        axis and statistics selection are calculated together with 
+        statistics_calculator.get_stats_block.
+        """
+        if calculator is not None and calculator is not statistics_calculator:
+            for element in self.get_all_elements():
+                stat_names = self.get_stat_names(element)
+                if stat_names is None:
+                    element.update_statistics(calculator, recompute)
+                else:
+                    element.update_statistics(calculator, recompute, stat_names)
+            return
+
+        # (id(block), stat_names) -> (block, stat_names, [(element, ts_name, column)])
+        pending: Dict[tuple, tuple[TimeSeriesBlock, Optional[tuple], list]] = {}
+
         for element in self.get_all_elements():
-            element.update_statistics(calculator)
+            stat_names = self.get_stat_names(element)
+            for ts_name in element.get_ts_names_to_update(
+                    statistics_calculator, recompute, stat_names):
+                column = element.get_ts_column(ts_name)
+                block = column.get_block()
+                pending.setdefault(
+                    (id(block), stat_names), (block, stat_names, [])
+                )[2].append((element, ts_name, column.get_column()))
+            element.mark_statistics_updated(statistics_calculator, stat_names)
+
+        for block, stat_names, items in pending.values():
+            self._update_block_statistics(block, stat_names, items)
 
     # -------------------------
     # String
@@ -261,55 +392,139 @@ class ElementCollection:
     # Internal helpers
     # -------------------------
 
-    def _find_column_in_dataframe(
-        self,
-        element: BaseElement,
-        df: pd.DataFrame
-    ) -> Optional[Union[str, tuple[str, float]]]:
-
-        cols = df.columns
-
+    def _index_element(self, element: BaseElement) -> None:
         element_id = element.get_element_id()
-        element_chainage = element.get_chainage()
-
-        # Simple columns
-        if not isinstance(cols, pd.MultiIndex):
-            return element_id if element_id in cols else None
-
-        # MultiIndex case
-        level0 = cols.get_level_values(0)
-        if element_id not in level0:
-            return None
-
-        sub_df = df[element_id]
-        chainages = sub_df.columns
+        alias = element.get_element_alias()
+        self._by_quantity_and_id.setdefault(
+            (element.get_quantity_id(), element_id), []).append(element)
+        self._by_id.setdefault(element_id, []).append(element)
+        if alias:
+            self._by_alias.setdefault(alias, []).append(element)
+
+    def _unindex_element(self, element: BaseElement) -> None:
+        element_id = element.get_element_id()
+        alias = element.get_element_alias()
+        keys = [(self._by_quantity_and_id,
+                 (element.get_quantity_id(), element_id)),
+                (self._by_id, element_id)]
+        if alias:
+            keys.append((self._by_alias, alias))
+        for index, key in keys:
+            elements = index[key]
+            # remove by identity, the element may be replaced by an equal one
+            elements[:] = [e for e in elements if e is not element]
+            if not elements:
+                del index[key]
 
-        if element_chainage == self.CHAINAGE_LAST:
-            return (element_id, chainages[-1])
+    @staticmethod
+    def _update_block_statistics(
+        block: TimeSeriesBlock,
+        stat_names: Optional[tuple],
+        items: List[tuple[BaseElement, str, int]]
+    ) -> None:
+        columns = sorted(set(column for _, _, column in items))
+        positions = {column: k for k, column in enumerate(columns)}
+        stats = statistics_calculator.get_stats_block(
+            block.get_values(), block.get_index(), stat_names, columns)
+
+        for element, ts_name, column in items:
+            k = positions[column]
+            element.set_stats(
+                ts_name, {name: values[k] for name, values in stats.items()})
+
+    def _get_column_plan(self, quantity_id: str, cols: pd.Index) -> np.ndarray:
+        """
+        column position of each element of the quantity in cols, in the
+        order of get_elements_by_quantity. -1 if the element is not found.
+        """
+        plan = self._column_plans.get(quantity_id)
+        if plan is not None and (plan[0] is cols or plan[0].equals(cols)):
+            return plan[1]
+
+        elements = self.get_elements_by_quantity(quantity_id)
+        if isinstance(cols, pd.MultiIndex):
+            positions = self._find_columns_by_chainage(elements, cols)
+        else:
+            # first column of duplicated labels
+            first = np.flatnonzero(~cols.duplicated())
+            found = cols[first].get_indexer(
+                [e.get_element_id() for e in elements])
+            positions = np.where(found >= 0, first[found], -1)
+
+        self._column_plans[quantity_id] = (cols, positions)
+        return positions
+
+    def _find_columns_by_chainage(
+        self,
+        elements: List[BaseElement],
+        cols: pd.MultiIndex
+    ) -> np.ndarray:
+        """
+        position of the column of each element in (muid, chainage) columns,
+        at the chainage nearest to the element chainage, or the last column
+        of the muid for CHAINAGE_LAST
+        """
+        codes, muids = pd.factorize(cols.get_level_values(0))
+        chainages = np.asarray(cols.get_level_values(1), dtype=float)
+        # columns sorted by muid, then chainage
+        order = np.lexsort((chainages, codes))
+        sorted_chainages = chainages[order]
+        starts = np.searchsorted(codes[order], np.arange(len(muids) + 1))
+
+        positions = np.full(len(elements), -1, dtype=np.intp)
+        element_codes = muids.get_indexer([e.get_element_id() for e in elements])
+        for k, (element, code) in enumerate(zip(elements, element_codes)):
+            if code < 0:
+                continue
+            start, end = starts[code], starts[code + 1]
+            chainage = element.get_chainage()
+            if chainage == self.CHAINAGE_LAST:
+                positions[k] = order[start:end].max()
+                continue
+            # nearest of the two neighbouring chainages, lower one on ties
+            i = start + np.searchsorted(sorted_chainages[start:end], chainage)
+            if i == end or (i > start and chainage - sorted_chainages[i - 1]
+                            <= sorted_chainages[i] - chainage):
+                i -= 1
+            positions[k] = order[i]
 
-        closest = min(chainages, key=lambda c: abs(c - element_chainage))
-        return (element_id, closest)
+        return positions
 
     @staticmethod
-    def _row_to_simple_element(
+    def _dataframe_to_simple_elements(
         element_type: str,
-        row: pd.Series
-    ) -> simple_element.SimpleElement:
-        alias = row.get("alias")
-        if alias == 0:
-            alias = None
-
-        quantity = row.get("quantity")
-        muid = str(row.get("muid"))
-        chainage = row.get("chainage", 0.0)
-
-        return simple_element.SimpleElement(
-            muid,
-            alias,
-            element_type,
-            quantity,
-            chainage
-        )
+        element_df: pd.DataFrame
+    ) -> List[simple_element.SimpleElement]:
+        """
+        one element per distinct row. columns are normalized as whole 
+        arrays: missing values are 0, an alias of 0 is no alias, muids are
+        strings and chainages default to 0.0.
+        """
+        def column(name: str, default: Any) -> pd.Series:
+            if name not in element_df.columns:
+                return pd.Series(default, index=element_df.index, dtype=object)
+            return element_df[name].fillna(0)
+
+        alias = column("alias", None)
+        alias = alias.astype(object).where(alias.ne(0), None)
+        rows = pd.DataFrame({
+            "muid": column("muid", None).astype(str),
+            "alias": alias,
+            "quantity": column("quantity", None),
+            "chainage": column("chainage", 0.0),
+        })
+        # equal rows create equal elements, add_element keeps one of them
+        rows = rows[~rows.duplicated()]
+
+        return [
+            simple_element.SimpleElement(
+                muid, alias, element_type, quantity, chainage)
+            for muid, alias, quantity, chainage in zip(
+                rows["muid"].tolist(),
+                rows["alias"].tolist(),
+                rows["quantity"].tolist(),
+                rows["chainage"].tolist())
+        ]
 
     @staticmethod
     def _create_element_alias_lookup(
@@ -321,13 +536,10 @@ class ElementCollection:
             source = collection.get_element_type().lower()
             alias_lookup[source] = {}
 
-            for element in collection.get_all_elements():
-                alias = element.get_element_alias()
-                if not alias:
-                    continue
-                if alias in alias_lookup[source]:
+            for alias, elements in collection._by_alias.items():
+                if len(elements) > 1:
                     raise ValueError(f"Duplicate alias in {source}: {alias}")
-                alias_lookup[source][alias] = element
+                alias_lookup[source][alias] = elements[0]
 
         return alias_lookup
 
@@ -345,7 +557,8 @@ class ElementCollection:
             raise ValueError(f"Combined alias not found: {source}.{alias}")
 
         element = alias_lookup[source][alias]
-        if element.get_quantity_id() not in discharge_quantities:
+        if (not isinstance(element, combined_element.CombinedElement)
+                and element.get_quantity_id() not in discharge_quantities):
             raise ValueError(f"{source}.{alias} is not a discharge-like quantity")
 
         return element
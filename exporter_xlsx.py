@@ -5,25 +5,141 @@ Created on Thu Nov 21 13:28:20 2024
 @author: YWANG
 """
 
+import numpy as np
+import openpyxl
 import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+
+# cells converted to python values at once while a sheet is streamed
+CHUNK_CELLS = 1000000
+DATETIME_FORMAT = 'YYYY-MM-DD HH:MM:SS'
+# excel sheet limits, including the header row and the index column
+MAX_ROWS = 1048576
+MAX_COLUMNS = 16384
 
 def export_excel(dfs, xlsx_file_path, resample_t = None):
+    """
+    export data frames to IndexPage and one sheet Sh_k per data frame.
+    sheets are streamed row by row and closed once written, so the
+    workbook is never held in memory. data frames beyond the excel row or
+    column limit are split into sheets Sh_k_1, Sh_k_2, ... all listed in
+    IndexPage.
+    """
+
+    # sheet names and row and column slices of each data frame, known
+    # before anything is written
+    sheets = {}
+    for k, v in enumerate(dfs):
+        chunks = get_sheet_chunks(*get_export_shape(dfs[v], resample_t))
+        if len(chunks) == 1:
+            sheets[v] = [(f'Sh_{str(k)}', *chunks[0])]
+        else:
+            sheets[v] = [(f'Sh_{str(k)}_{str(j + 1)}', *chunk)
+                         for j, chunk in enumerate(chunks)]
 
     #get the index page
     pdIndexPage = {}
-    for k, v in enumerate(dfs):
-        pdIndexPage['Sh_'+str(k)] = v
+    for v, v_sheets in sheets.items():
+        for sheet_name, _, _ in v_sheets:
+            pdIndexPage[sheet_name] = v
     pdIndexPage = pd.DataFrame.from_dict(pdIndexPage, orient='index', columns=['ElementName'])
-    
-    with pd.ExcelWriter(xlsx_file_path) as writer:
-        pdIndexPage.to_excel(writer, sheet_name = 'IndexPage')
-        for k, v in enumerate(dfs):
-            df = dfs[v]
-            # resample
-            if resample_t is not None and df.shape[0] > 1:
-                df = df.resample(resample_t).interpolate('index')
-            df.to_excel(writer, sheet_name = f'Sh_{str(k)}')
+
+    workbook = openpyxl.Workbook(write_only=True)
+    write_sheet(workbook, 'IndexPage', pdIndexPage)
+    for k, v in enumerate(dfs):
+        df = dfs[v]
+        # resample
+        if resample_t is not None and df.shape[0] > 1:
+            df = df.resample(resample_t).interpolate('index')
+        # chunks are streamed from views of the data frame
+        for sheet_name, rows, columns in sheets[v]:
+            write_sheet(workbook, sheet_name, df.iloc[rows, columns])
+        if len(sheets[v]) == 1:
             print(f'"{v}" is exported to sheet sh_{k}')
-            
+        else:
+            print(f'"{v}" is exported to sheets sh_{k}_1 to '
+                  f'sh_{k}_{len(sheets[v])}')
+    workbook.save(xlsx_file_path)
+
     if resample_t is not None:
-        print(f"Data is resampled to {resample_t} interval. ")
\ No newline at end of file
+        print(f"Data is resampled to {resample_t} interval. ")
+
+
+def get_export_shape(df, resample_t=None):
+    """
+    rows and columns of a data frame as exported, after resampling
+    """
+    if resample_t is not None and df.shape[0] > 1:
+        # bins of the resampled index, without resampling any values
+        return len(df.iloc[:, :0].resample(resample_t).asfreq()), df.shape[1]
+    return df.shape
+
+
+def get_sheet_chunks(n_rows, n_columns):
+    """
+    row and column slices of the sheets a data frame is split into, so
+    that every sheet fits within MAX_ROWS and MAX_COLUMNS. one sheet if it
+    fits already.
+    """
+    row_step = MAX_ROWS - 1
+    column_step = MAX_COLUMNS - 1
+    rows = [slice(start, start + row_step)
+            for start in range(0, max(n_rows, 1), row_step)]
+    columns = [slice(start, start + column_step)
+               for start in range(0, max(n_columns, 1), column_step)]
+    return [(row_slice, column_slice)
+            for row_slice in rows for column_slice in columns]
+
+
+def write_sheet(workbook, sheet_name, df):
+    """
+    stream a data frame to a new sheet of a write-only workbook, in the
+    layout of df.to_excel: index name and column names in the first row,
+    index in the first column. missing values are empty cells.
+    """
+    ws = workbook.create_sheet(sheet_name)
+    ws.append([_to_cell(ws, value) for value in [df.index.name, *df.columns]])
+
+    chunk_rows = max(1, CHUNK_CELLS // max(1, df.shape[1]))
+    for start in range(0, df.shape[0], chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        index = [_to_cell(ws, value) for value in chunk.index]
+        for label, row in zip(index, _to_cells(ws, chunk).tolist()):
+            ws.append([label, *row])
+
+    # rows are in a temporary file now, only copied into the zip on save
+    ws.close()
+
+
+def _to_cells(ws, df):
+    """
+    cell values of a data frame as an object array. NaN is an empty cell,
+    infinite floats are 'inf' and '-inf' like df.to_excel
+    """
+    values = df.to_numpy()
+    if values.dtype.kind != 'f':
+        cells = df.to_numpy(dtype=object, copy=True)
+        for k, value in np.ndenumerate(cells):
+            cells[k] = _to_cell(ws, value)
+        return cells
+
+    cells = values.astype(object)
+    cells[np.isnan(values)] = None
+    cells[np.isposinf(values)] = 'inf'
+    cells[np.isneginf(values)] = '-inf'
+    return cells
+
+
+def _to_cell(ws, value):
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        if np.isinf(value):
+            return 'inf' if value > 0 else '-inf'
+    elif value is None or value is pd.NaT or value is pd.NA:
+        return None
+    elif isinstance(value, pd.Timestamp):
+        cell = WriteOnlyCell(ws, value=value.to_pydatetime())
+        cell.number_format = DATETIME_FORMAT
+        return cell
+    return value
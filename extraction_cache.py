@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Author: Yi Wang
+# this module keeps time series extracted from res1d files in an on-disk
+# cache. one entry per (res1d file, element type, quantity), saved as a .npy
+# block with the columns of all cached elements side by side and a .json
+# file locating each element in the block. entries are loaded through
+# memory mapping and evicted in least-recently-used order.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+class ExtractionCache:
+
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+    HASH_CHUNK_BYTES = 16 * 1024 ** 2
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES,
+                 content_hash=False):
+        """
+        initiate instance. create cache folder if it does not exist
+
+        Parameters
+        ----------
+        cache_dir : str
+            folder to save cache entries.
+        max_bytes : int, optional
+            maximum size of cache entries. The default is 10 GB.
+        content_hash : bool, optional
+            identify res1d files by content hash instead of modification
+            time. The default is False.
+
+        Returns
+        -------
+        None.
+
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self._content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+
+    def get_file_fingerprint(self, file_path):
+        """
+        identify a res1d file by path, size and modification time or
+        content hash
+
+        Parameters
+        ----------
+        file_path : str
+            path to res1d file.
+
+        Returns
+        -------
+        list
+            path, size and modification time or sha1 of content.
+
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        if not self._content_hash:
+            return [file_path, stat.st_size, stat.st_mtime_ns]
+
+        digest = hashlib.sha1()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        return [file_path, stat.st_size, digest.hexdigest()]
+
+    def get(self, fingerprint, element_kind, quantity_id, elements):
+        """
+        get cached arrays of elements of one type and quantity
+
+        Parameters
+        ----------
+        fingerprint : list
+            res1d file fingerprint from get_file_fingerprint.
+        element_kind : str
+            element type, e.g. node, link, weir, catchment.
+        quantity_id : str
+            quantity ID.
+        elements : list
+            (element MUID, chainage) of each element. chainage is None, a
+            float or a list of requested chainages.
+
+        Returns
+        -------
+        list
+            per element, a read-only memory mapped array and its column
+            labels, or None if the element is not cached.
+
+        """
+        block = self._read_entry(
+            self._get_entry_path(fingerprint, element_kind, quantity_id))
+        results = []
+        for element_id, chainage in elements:
+            result = None if block is None else block.get(
+                _get_element_key(element_id, chainage))
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(result)
+        return results
+
+    def put(self, fingerprint, element_kind, quantity_id, arrays):
+        """
+        save extracted arrays of elements of one type and quantity. elements
+        already cached in the entry are kept.
+
+        Parameters
+        ----------
+        fingerprint : list
+            res1d file fingerprint from get_file_fingerprint.
+        element_kind : str
+            element type, e.g. node, link, weir, catchment.
+        quantity_id : str
+            quantity ID.
+        arrays : list
+            (element MUID, chainage, data, columns) of each element. data
+            holds one column per gridpoint, columns are its labels, e.g.
+            chainages, or None.
+
+        Returns
+        -------
+        None.
+
+        """
+        path = self._get_entry_path(fingerprint, element_kind, quantity_id)
+        block = self._read_entry(path) or {}
+        for element_id, chainage, data, columns in arrays:
+            block[_get_element_key(element_id, chainage)] = (
+                np.asarray(data), columns)
+
+        elements = []
+        start = 0
+        for key, (data, columns) in block.items():
+            elements.append([key, start, start + data.shape[1], columns])
+            start += data.shape[1]
+        values = np.concatenate([data for data, _ in block.values()], axis=1)
+        # release memory mapped columns of the previous entry
+        del block
+
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        np.save(temp_path + '.npy', values)
+        with open(temp_path + '.json', 'w', encoding='utf-8') as f:
+            json.dump({'columns': values.shape[1], 'elements': elements}, f)
+        try:
+            os.replace(temp_path + '.json', path + '.json')
+            os.replace(temp_path + '.npy', path + '.npy')
+        except OSError:
+            # the entry is memory mapped elsewhere, e.g. on Windows. it is
+            # cached again by a later run
+            for temp_file in [temp_path + '.json', temp_path + '.npy']:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+    def evict(self):
+        """
+        remove least recently used entries until the cache fits in its
+        size limit. sizes and last use of all entries are collected in one
+        pass over the cache folder, so call this once after extraction.
+        entries that cannot be removed, e.g. memory mapped ones, still
+        count towards the limit.
+
+        Returns
+        -------
+        int
+            number of removed entries.
+
+        """
+        # entry path -> [last use, bytes of the .npy and .json files]
+        entries = {}
+        for entry in os.scandir(self._cache_dir):
+            path, extension = os.path.splitext(entry.path)
+            if extension not in ('.npy', '.json') or '.tmp' in entry.name:
+                continue
+            stat = entry.stat()
+            last_use, size = entries.get(path, (0, 0))
+            if extension == '.npy':
+                last_use = stat.st_mtime_ns
+            entries[path] = [last_use, size + stat.st_size]
+
+        total_bytes = sum(size for _, size in entries.values())
+        removed = 0
+        for path, (_, size) in sorted(entries.items(),
+                                      key=lambda item: item[1][0]):
+            if total_bytes <= self._max_bytes:
+                break
+            try:
+                os.remove(path + '.npy')
+            except FileNotFoundError:
+                # removed by another process in the meantime
+                pass
+            except OSError:
+                continue
+            total_bytes -= size
+            removed += 1
+            try:
+                os.remove(path + '.json')
+            except OSError:
+                pass
+        return removed
+
+    def _read_entry(self, path):
+        """
+        element key -> (memory mapped columns, column labels) of an entry,
+        or None if it is not cached
+        """
+        try:
+            data = np.load(path + '.npy', mmap_mode='r')
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                labels = json.load(f)
+            elements = labels['elements']
+            if data.ndim != 2 or labels['columns'] != data.shape[1]:
+                # .json and .npy files of different writes
+                return None
+            # last use of the entry for evict
+            os.utime(path + '.npy')
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return {key: (data[:, start:stop], columns)
+                for key, start, stop, columns in elements}
+
+    def _get_entry_path(self, fingerprint, element_kind, quantity_id):
+        key = json.dumps([*fingerprint, element_kind, quantity_id])
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, name)
+
+    def __repr__(self):
+        return (f"<ExtractionCache {self._cache_dir}, hits={self.hits}, "
+                f"misses={self.misses}>")
+
+
+def _get_element_key(element_id, chainage):
+    return json.dumps([element_id, chainage])
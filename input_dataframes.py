@@ -7,6 +7,7 @@ import os
 import pandas as pd
 from typing import Dict, List, Any
 import element_collection
+import statistics_calculator
 
 
 COMBINED_QUANTITY = "CalculatedDischarge"
@@ -261,6 +262,33 @@ def create_excel_collection_from_dataframes(dfs):
         trunc_time = xlsx_dict.pop('trunc_time')
     else:
         trunc_time = None
+
+    selective_load = normalize_bool_option(
+        xlsx_dict.pop('selective_load', False))
+
+    cache_dir = xlsx_dict.pop('cache_dir', None)
+    if cache_dir == 0:
+        cache_dir = None
+    if cache_dir is not None:
+        cache_dir = os.path.join(folder_path, str(cache_dir))
+
+    cache_size_gb = xlsx_dict.pop('cache_size_gb', None)
+    if cache_size_gb == 0:
+        cache_size_gb = None
+
+    workers = xlsx_dict.pop('workers', None)
+    if workers == 0:
+        workers = None
+    if workers is not None:
+        workers = int(workers)
+
+    prefetch_depth = int(xlsx_dict.pop('prefetch_depth', 0))
+
+    prefetch_memory_gb = xlsx_dict.pop('prefetch_memory_gb', None)
+    if prefetch_memory_gb == 0:
+        prefetch_memory_gb = None
+
+    statistics = create_stats_selection(xlsx_dict)
         
     if resample_t == 0:
         resample_t = None
@@ -279,10 +307,75 @@ def create_excel_collection_from_dataframes(dfs):
     xlsx_dict['resample_t'] = resample_t
     xlsx_dict['skip_time'] = skip_time
     xlsx_dict['trunc_time'] = trunc_time
+    xlsx_dict['selective_load'] = selective_load
+    xlsx_dict['cache_dir'] = cache_dir
+    xlsx_dict['cache_size_gb'] = cache_size_gb
+    xlsx_dict['workers'] = workers
+    xlsx_dict['prefetch_depth'] = prefetch_depth
+    xlsx_dict['prefetch_memory_gb'] = prefetch_memory_gb
+    xlsx_dict['statistics'] = statistics
     
     return xlsx_dict
 
 
+def create_stats_selection(xlsx_dict):
+    """
+    Pop "statistics" and "statistics.<selector>" options and return the
+    statistics selection, selector -> statistic names. The selector is an
+    element type, a quantity or "<element_type>.<quantity>". The
+    "statistics" option applies to all other elements. "all" selects all
+    statistics, also for a selector of a narrower "statistics" option.
+    Returns None if no statistics are selected, i.e. all statistics are
+    calculated.
+    """
+    selection = {}
+    for key in [k for k in xlsx_dict if isinstance(k, str)]:
+        if key == 'statistics':
+            selector = None
+        elif key.startswith('statistics.'):
+            selector = key[len('statistics.'):]
+        else:
+            continue
+        value = xlsx_dict.pop(key)
+        stat_names = parse_stat_names(value)
+        if stat_names is not None:
+            statistics_calculator.validate_stat_names(stat_names)
+            selection[selector] = stat_names
+        elif selector is not None and is_all_stat_names(value):
+            # None selects all statistics, see select_stat_names
+            selection[selector] = None
+    return selection or None
+
+
+def parse_stat_names(value):
+    """
+    Convert a comma separated string or list of statistic names to a list.
+    Empty values and "all" give None.
+    """
+    if value is None or (not isinstance(value, (list, tuple)) and pd.isna(value)):
+        return None
+    if value == 0:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    names = [str(name).strip() for name in value if str(name).strip()]
+    if not names or [name.lower() for name in names] == ['all']:
+        return None
+    return names
+
+
+def is_all_stat_names(value):
+    """
+    True if value selects all statistics, i.e. is "all".
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        return False
+    names = [str(name).strip().lower() for name in value if str(name).strip()]
+    return names == ['all']
+
+
 def normalize_resample_interval(value):
     """
     Convert human-readable durations to pandas resample frequency aliases.
@@ -307,6 +400,19 @@ def normalize_resample_interval(value):
         return text
 
     return f"{amount}{unit_alias}"
+
+
+def normalize_bool_option(value):
+    """
+    Convert yes/no style option values to bool.
+    """
+    if value is None or pd.isna(value):
+        return False
+
+    if isinstance(value, str):
+        return value.strip().lower() in ['1', 'true', 'yes', 'y', 'on']
+
+    return bool(value)
 
 
 def create_res1d_collections_from_dataframes(dfs):
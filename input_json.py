@@ -110,6 +110,8 @@ def validate_combined(dfs, combined):
     for name, df in dfs.items():
         if "alias" in df.columns and "quantity" in df.columns:
             lookup[name] = dict(zip(df["alias"], df["quantity"]))
+    # combined items can be terms of other combined items
+    lookup["combined"] = {item["alias"]: item["quantity"] for item in combined}
 
     for item in combined:
         for term in item["terms"]:
@@ -124,7 +126,7 @@ def validate_combined(dfs, combined):
                 errors.append(f"Alias not found: {src}.{alias}")
                 continue
 
-            if lookup[src][alias] not in DISCHARGE_QUANTITIES:
+            if src != "combined" and lookup[src][alias] not in DISCHARGE_QUANTITIES:
                 errors.append(f"{src}.{alias} is not Discharge")
 
     return errors
@@ -142,9 +144,25 @@ def _output_files_dataframe_to_json(output_files_df):
         "resample_interval": output_files.get("resample_t"),
         "skip_time": output_files.get("skip_time"),
         "trunc_time": output_files.get("trunc_time"),
+        "selective_load": input_dataframes.normalize_bool_option(
+            output_files.get("selective_load")),
+        "cache_dir": output_files.get("cache_dir"),
+        "cache_size_gb": output_files.get("cache_size_gb"),
+        "workers": output_files.get("workers"),
+        "prefetch_depth": output_files.get("prefetch_depth"),
+        "prefetch_memory_gb": output_files.get("prefetch_memory_gb"),
         "export_by_element": "by_elements" in output_files,
         "export_by_result_file": "by_file" in output_files,
         "export_statistics": "stats" in output_files,
+        "statistics": input_dataframes.parse_stat_names(
+            output_files.get("statistics")),
+        "statistics_by": {
+            key[len("statistics."):]: (
+                "all" if input_dataframes.is_all_stat_names(value)
+                else input_dataframes.parse_stat_names(value))
+            for key, value in output_files.items()
+            if isinstance(key, str) and key.startswith("statistics.")
+        },
     }
 
 
@@ -176,6 +194,14 @@ def _output_files_json_to_dataframe(output_files):
     if trunc_time:
         rows.append({"type": "trunc_time", "value": trunc_time})
 
+    if output_files.get("selective_load"):
+        rows.append({"type": "selective_load", "value": True})
+
+    for key in ["cache_dir", "cache_size_gb", "workers", "prefetch_depth",
+                "prefetch_memory_gb"]:
+        if output_files.get(key):
+            rows.append({"type": key, "value": output_files[key]})
+
     if output_files.get("by_elements"):
         rows.append({"type": "by_elements", "value": output_files["by_elements"]})
     elif output_files.get("export_by_element"):
@@ -191,6 +217,20 @@ def _output_files_json_to_dataframe(output_files):
     elif output_files.get("export_statistics"):
         rows.append({"type": "stats", "value": "stats.xlsx"})
 
+    # statistics: list of names for all elements
+    # statistics_by: element type, quantity or "<element_type>.<quantity>" -> list of names
+    statistics = {"statistics": output_files.get("statistics")}
+    for selector, stat_names in (output_files.get("statistics_by") or {}).items():
+        statistics[f"statistics.{selector}"] = stat_names
+    for key, stat_names in statistics.items():
+        # "all" of a selector overrides a narrower "statistics" option
+        if key != "statistics" and input_dataframes.is_all_stat_names(stat_names):
+            rows.append({"type": key, "value": "all"})
+            continue
+        stat_names = input_dataframes.parse_stat_names(stat_names)
+        if stat_names:
+            rows.append({"type": key, "value": ", ".join(stat_names)})
+
     return {"output_files": pd.DataFrame(rows)}
 
 
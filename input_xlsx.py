@@ -3,6 +3,8 @@
 # this module build input dataframes using input excel files
 
 import os
+from itertools import zip_longest
+import openpyxl
 import pandas as pd
 import numpy as np
 import input_dataframes
@@ -14,6 +16,25 @@ ELEMENT_SHEETS = [
 ]
 
 OPTIONAL_ELEMENT_SHEETS = ['bridge', 'direct_discharge', 'gate']
+
+ELEMENT_DTYPES = {'alias': object,
+                  'quantity': object,
+                  'muid': object,
+                  'chainage': np.float64}
+
+# column dtypes of every sheet read from input spreadsheets. columns not 
+# listed here are inferred
+SHEET_DTYPES = {sheet_name: ELEMENT_DTYPES for sheet_name in ELEMENT_SHEETS}
+SHEET_DTYPES['output_files'] = {'type': object,
+                                'value': object}
+SHEET_DTYPES['res1d_files'] = {'result_type': object,
+                               'short_name': object,
+                               'res1d_file_path': object}
+SHEET_DTYPES['combined'] = {'combined_alias': object,
+                            'quantity': object,
+                            'op': object,
+                            'source': object,
+                            'source_alias': object}
 
 # dataframe <==> xlsx
 # write dataframe templates to spreadsheets:
@@ -33,70 +54,151 @@ def create_template_xlsx(xlsx_file_path):
 
 
 # read dataframes from spreadsheets
-def read_element_collections_dataframes_from_xlsx(xlsx_file_path):
+def read_sheets_from_xlsx(xlsx_file_path, sheet_names=None):
+    """
+    read sheets from one workbook, opened once in read-only mode. rows are 
+    streamed and columns are converted to the dtypes in SHEET_DTYPES.
+
+    Parameters
+    ----------
+    xlsx_file_path : str
+        path to the xlsx file.
+    sheet_names : list, optional
+        sheets to read. sheets not in the workbook are left out. The default
+        is None, i.e. all sheets.
+
+    Returns
+    -------
+    dict
+        data frames keyed by sheet name.
+
+    """
+    workbook = openpyxl.load_workbook(
+        xlsx_file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        if sheet_names is None:
+            sheet_names = workbook.sheetnames
+        return {sheet_name: _read_sheet(workbook[sheet_name],
+                                        SHEET_DTYPES.get(sheet_name, {}))
+                for sheet_name in sheet_names
+                if sheet_name in workbook.sheetnames}
+    finally:
+        workbook.close()
+
+
+def _read_sheet(sheet, dtypes):
+    """
+    first row is the header, empty cells are missing values and trailing
+    empty rows are dropped, like pd.read_excel
+    """
+    sheet.reset_dimensions()
+    rows = []
+    last_row_with_data = -1
+    for row in sheet.iter_rows(values_only=True):
+        row = [_convert_cell_value(value) for value in row]
+        while row and row[-1] is None:
+            row.pop()
+        if row:
+            last_row_with_data = len(rows)
+        rows.append(row)
+    rows = rows[:last_row_with_data + 1]
+    if not rows:
+        return pd.DataFrame()
+
+    width = max(len(row) for row in rows)
+    header = rows[0] + [None] * (width - len(rows[0]))
+    columns = list(zip_longest(*rows[1:], fillvalue=None))
+    columns += [(None,) * (len(rows) - 1)] * (width - len(columns))
+    return pd.DataFrame({
+        name: _convert_column(values, dtypes.get(name))
+        for name, values in zip(_get_column_names(header), columns)})
+
+
+def _convert_cell_value(value):
+    if value == '':
+        return None
+    # whole numbers are read as int, like pd.read_excel
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _get_column_names(header):
+    names = []
+    seen = {}
+    for k, name in enumerate(header):
+        if name is None:
+            name = f'Unnamed: {k}'
+        # duplicated names are numbered, like pd.read_excel
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(name if count == 0 else f'{name}.{count}')
+    return names
+
+
+def _convert_column(values, dtype):
+    values = [np.nan if v is None else v for v in values]
+    if dtype is None:
+        return pd.Series(values)
+    return pd.Series(np.array(values, dtype=dtype), dtype=dtype, copy=False)
+
+
+def read_element_collections_dataframes_from_xlsx(xlsx_file_path, sheets=None):
+    if sheets is None:
+        sheets = read_sheets_from_xlsx(xlsx_file_path, ELEMENT_SHEETS)
     dfs = {}
-    with pd.ExcelFile(xlsx_file_path) as workbook:
-        for sheet_name in ELEMENT_SHEETS:
-            if sheet_name not in workbook.sheet_names:
-                if sheet_name in OPTIONAL_ELEMENT_SHEETS:
-                    dfs[sheet_name] = pd.DataFrame({
-                        'alias': [],
-                        'quantity': [],
-                        'muid': []
-                    })
-                    continue
-                raise ValueError(f"Worksheet named '{sheet_name}' not found")
-
-            dfs[sheet_name] = pd.read_excel(
-                            workbook,
-                            sheet_name=sheet_name,
-                            dtype = {'alias': object,
-                                     'quantity': object,
-                                     'muid': object,
-                                     'chainage': np.float64})
+    for sheet_name in ELEMENT_SHEETS:
+        if sheet_name not in sheets:
+            if sheet_name in OPTIONAL_ELEMENT_SHEETS:
+                dfs[sheet_name] = pd.DataFrame({
+                    'alias': [],
+                    'quantity': [],
+                    'muid': []
+                })
+                continue
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        dfs[sheet_name] = sheets[sheet_name]
     return dfs
 
 
-def read_output_files_dataframes_from_xlsx(xlsx_file_path):
-    dfs = pd.read_excel(xlsx_file_path, 
-                        sheet_name = ['output_files'],
-                        dtype = {'type': object, 
-                                 'value': object})
-    return dfs
+def read_output_files_dataframes_from_xlsx(xlsx_file_path, sheets=None):
+    return {'output_files': _get_sheet(xlsx_file_path, 'output_files', sheets)}
 
 
-def read_res1d_files_dataframes_from_xlsx(xlsx_file_path):
-    dfs = pd.read_excel(xlsx_file_path, 
-                        sheet_name = ['res1d_files'],
-                        dtype = {'result_type': object, 
-                                 'short_name': object,
-                                 'res1d_file_path': object})
-    return dfs
+def read_res1d_files_dataframes_from_xlsx(xlsx_file_path, sheets=None):
+    return {'res1d_files': _get_sheet(xlsx_file_path, 'res1d_files', sheets)}
 
 
-def read_combined_dataframe_from_xlsx(xlsx_file_path):
+def read_combined_dataframe_from_xlsx(xlsx_file_path, sheets=None):
     try:
-        dfs = pd.read_excel(xlsx_file_path,
-                            sheet_name=['combined'],
-                            dtype={'combined_alias': object,
-                                   'quantity': object,
-                                   'op': object,
-                                   'source': object,
-                                   'source_alias': object})
+        return _get_sheet(xlsx_file_path, 'combined', sheets)
     except ValueError as exc:
         if "Worksheet named 'combined' not found" in str(exc):
             return pd.DataFrame()
         raise
 
-    return dfs['combined']
+
+def _get_sheet(xlsx_file_path, sheet_name, sheets=None):
+    if sheets is None:
+        sheets = read_sheets_from_xlsx(xlsx_file_path, [sheet_name])
+    if sheet_name not in sheets:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return sheets[sheet_name]
 
 
 def read_dataframes_from_xlsx(xlsx_file_path):
+    # all sheets are read in one pass over the workbook
+    sheets = read_sheets_from_xlsx(
+        xlsx_file_path,
+        ['res1d_files', *ELEMENT_SHEETS, 'output_files', 'combined'])
 
-    res1d_file_dfs = read_res1d_files_dataframes_from_xlsx(xlsx_file_path)
-    element_collections_dfs = read_element_collections_dataframes_from_xlsx(xlsx_file_path)
-    output_files_dfs = read_output_files_dataframes_from_xlsx(xlsx_file_path)
-    combined_df = read_combined_dataframe_from_xlsx(xlsx_file_path)
+    res1d_file_dfs = read_res1d_files_dataframes_from_xlsx(xlsx_file_path, sheets)
+    element_collections_dfs = read_element_collections_dataframes_from_xlsx(
+        xlsx_file_path, sheets)
+    output_files_dfs = read_output_files_dataframes_from_xlsx(
+        xlsx_file_path, sheets)
+    combined_df = read_combined_dataframe_from_xlsx(xlsx_file_path, sheets)
     combined = input_dataframes.create_combined_from_dataframe(combined_df)
 
     return [res1d_file_dfs, element_collections_dfs, output_files_dfs, combined]
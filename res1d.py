@@ -6,6 +6,8 @@
 
 import os
 import sys
+import ctypes
+from dataclasses import dataclass, field
 import pandas as pd
 import numpy as np
 
@@ -17,10 +19,105 @@ MikePath.setup_mike_installation(sys.path)
 import clr
 
 clr.AddReference("DHI.Mike1D.ResultDataAccess")
-from DHI.Mike1D.ResultDataAccess import ResultData
+from DHI.Mike1D.ResultDataAccess import ResultData, Filter, DataItemFilterName
 
 clr.AddReference("DHI.Mike1D.Generic")
-from DHI.Mike1D.Generic import Connection
+from DHI.Mike1D.Generic import Connection, Diagnostics
+
+from System.Runtime.InteropServices import GCHandle, GCHandleType
+
+
+# .NET DateTime ticks (100 ns) between 0001-01-01 and 1970-01-01
+DOTNET_TICKS_AT_UNIX_EPOCH = 621355968000000000
+NANOSECONDS_PER_TICK = 100
+
+
+def _dotnet_ticks_to_datetime64(ticks):
+    """
+    convert .NET DateTime ticks to numpy datetime64[ns] values
+
+    Parameters
+    ----------
+    ticks : array-like of int
+        .NET DateTime.Ticks values.
+
+    Returns
+    -------
+    np.ndarray
+        datetime64[ns] array. sub-second precision is kept.
+
+    """
+    ticks = np.asarray(ticks, dtype=np.int64)
+    return ((ticks - DOTNET_TICKS_AT_UNIX_EPOCH) * NANOSECONDS_PER_TICK
+            ).view('datetime64[ns]')
+
+
+# .NET element types that can be copied to numpy as one memory block
+DOTNET_NUMPY_DTYPES = {
+    'System.Single': np.float32,
+    'System.Double': np.float64,
+    'System.Int32': np.int32,
+    'System.Int64': np.int64,
+}
+
+
+def _dotnet_array_to_numpy(array):
+    """
+    copy a .NET array of primitives to a preallocated numpy array. the .NET
+    array is pinned and its memory block is copied in one transfer. .NET 
+    multi-dimensional arrays are row-major, so 1-D and 2-D arrays keep
+    their shape.
+
+    Parameters
+    ----------
+    array : System.Array
+        .NET array, e.g. float[] or float[,].
+
+    Returns
+    -------
+    np.ndarray or None
+        numpy array of the same shape and element type. None if the bulk 
+        transfer is not available for this array.
+
+    """
+    try:
+        element_type = array.GetType().GetElementType().FullName
+        shape = tuple(array.GetLength(k) for k in range(array.Rank))
+    except AttributeError:
+        return None
+    dtype = DOTNET_NUMPY_DTYPES.get(element_type)
+    if dtype is None:
+        return None
+
+    data = np.empty(shape, dtype=dtype)
+    if data.size == 0:
+        return data
+
+    handle = GCHandle.Alloc(array, GCHandleType.Pinned)
+    try:
+        address = handle.AddrOfPinnedObject().ToInt64()
+        ctypes.memmove(data.ctypes.data, address, data.nbytes)
+    finally:
+        handle.Free()
+    return data
+
+
+@dataclass
+class LoadRequest:
+    """
+    elements and quantities to read from res1d files, keyed by element type,
+    e.g. 'node', 'link', 'weir' or 'catchment'
+    """
+    element_ids: dict[str, set[str]] = field(default_factory=dict)
+    quantity_ids: dict[str, set[str]] = field(default_factory=dict)
+
+    def add(self, element_type, element_ids, quantity_ids):
+        element_type = element_type.lower()
+        self.element_ids.setdefault(element_type, set()).update(element_ids)
+        self.quantity_ids.setdefault(element_type, set()).update(quantity_ids)
+
+    def get_element_types(self):
+        return list(self.element_ids.keys())
 
 
 class Res1D:
@@ -38,18 +135,31 @@ class Res1D:
         pandas timestamp
 
         """
-        return pd.Timestamp(year=t.get_Year(), 
-                            month=t.get_Month(), 
-                            day=t.get_Day(), 
-                            hour=t.get_Hour(), 
-                            minute=t.get_Minute(), 
-                            second=t.get_Second())
+        return pd.Timestamp(_dotnet_ticks_to_datetime64(t.Ticks))
     
     
+    def _load_time_axis(self):
+        """
+        convert the full res1d time list to a datetime64[ns] array in one
+        pass. only DateTime.Ticks is read from .NET for each time step.
+
+        Returns
+        -------
+        np.ndarray
+            datetime64[ns] array of all time steps in the res1d file.
+
+        """
+        times = self.result_data.TimesList
+        ticks = np.fromiter((t.Ticks for t in times), dtype=np.int64,
+                            count=times.Count)
+        return _dotnet_ticks_to_datetime64(ticks)
+
+
     def _get_time(self, from_time_stamp=None, to_time_stamp=None):
         """
         get indices and time stamps from res1d file. options to limit start 
-        and end time
+        and end time. the cached time axis is searched, so no .NET call is 
+        made here.
 
         Parameters
         ----------
@@ -61,22 +171,24 @@ class Res1D:
         Returns
         -------
         list
-            lists of indices and pd.Timestamp.
+            slice of time step positions and pd.DatetimeIndex.
 
         """
-        time_stamps = [self._res1d_time_to_pd_timestamp(t) 
-                       for t in list(self.result_data.TimesList)]
-        if not time_stamps:
-            return [], pd.DatetimeIndex([])
+        time_axis = self._time_axis
+        if time_axis.size == 0:
+            return slice(0, 0), pd.DatetimeIndex([])
 
-        from_time_stamp = from_time_stamp or time_stamps[0]
-        to_time_stamp = to_time_stamp or time_stamps[-1]
+        start = 0
+        stop = time_axis.size
+        if from_time_stamp is not None:
+            start = time_axis.searchsorted(
+                pd.Timestamp(from_time_stamp).to_datetime64(), side='left')
+        if to_time_stamp is not None:
+            stop = time_axis.searchsorted(
+                pd.Timestamp(to_time_stamp).to_datetime64(), side='right')
+        stop = max(start, stop)
 
-        indices_time_stamp = [i for i, t in enumerate(time_stamps) 
-                              if from_time_stamp <= t <= to_time_stamp]
-        return indices_time_stamp, pd.DatetimeIndex(
-            [time_stamps[i] for i in indices_time_stamp]
-            )
+        return slice(start, stop), pd.DatetimeIndex(time_axis[start:stop])
 
 
     def _validate_file_path(self, file_path):
@@ -102,7 +214,8 @@ class Res1D:
             raise FileNotFoundError(f"File does not exist: {file_path}")
 
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, load_request=None, header_only=False,
+                 cache=None):
         """
         initiate instance. read from res1d file and load properties
 
@@ -110,6 +223,18 @@ class Res1D:
         ----------
         file_path : str
             path to res1d file.
+        load_request : LoadRequest, optional
+            elements and quantities to be extracted. if provided, only the 
+            header is read here and subclasses load data of the requested
+            elements once their index is built. The default is None, i.e. 
+            all data is loaded.
+        header_only : bool, optional
+            read the network structure and time axis only. values are loaded
+            on the first extraction call. The default is False.
+        cache : extraction_cache.ExtractionCache, optional
+            on-disk cache of extracted time series. cached elements are 
+            read from the cache instead of the res1d file. The default is 
+            None.
 
         Returns
         -------
@@ -119,7 +244,19 @@ class Res1D:
         self._validate_file_path(file_path)
         self.result_data = ResultData()
         self.result_data.Connection = Connection.Create(file_path)
-        self.result_data.Load()
+        self.load_request = load_request
+        self.header_only = header_only
+        self.cache = cache
+        self._file_fingerprint = None
+        if cache is not None:
+            self._file_fingerprint = cache.get_file_fingerprint(file_path)
+        if load_request is None and not header_only:
+            self.result_data.Load()
+            self._data_loaded = True
+        else:
+            self.result_data.LoadHeader(True, Diagnostics('res1d header'))
+            self._data_loaded = False
+        self._time_axis = self._load_time_axis()
         self.from_time_stamp = self._res1d_time_to_pd_timestamp(
             self.result_data.StartTime)
         self.to_time_stamp = self._res1d_time_to_pd_timestamp(
@@ -127,10 +264,64 @@ class Res1D:
         self.time_stamp_indices, self.df_time_stamps = self._get_time()
 
 
+    def _ensure_data_loaded(self):
+        """
+        load values if only the header has been read so far
+        """
+        if self._data_loaded:
+            return
+        if self.load_request is None:
+            self.result_data.LoadData(Diagnostics('res1d data'))
+        else:
+            self._load_requested_data(self.load_request)
+        self._data_loaded = True
+
+
+    def _load_requested_data(self, load_request):
+        """
+        load data of requested elements. subclasses resolve the request 
+        against their element index; by default all data is loaded.
+        """
+        self.result_data.LoadData(Diagnostics('res1d data'))
+
+
+    def _load_filtered_data(self, nodes=(), reaches=(), catchments=()):
+        """
+        load data of the listed elements only. data items of other elements
+        are not read from the res1d file.
+
+        Parameters
+        ----------
+        nodes : iterable of str, optional
+            node IDs.
+        reaches : iterable of str, optional
+            reach names.
+        catchments : iterable of str, optional
+            catchment IDs.
+
+        Returns
+        -------
+        None.
+
+        """
+        name_filter = DataItemFilterName(self.result_data)
+        for node in nodes:
+            name_filter.Nodes.Add(node)
+        for reach in reaches:
+            name_filter.Reaches.Add(reach)
+        for catchment in catchments:
+            name_filter.Catchments.Add(catchment)
+
+        data_filter = Filter()
+        data_filter.AddDataItemFilter(name_filter)
+        self.result_data.Parameters.Filter = data_filter
+        self.result_data.LoadData(Diagnostics('res1d data'))
+
+
     def setTimeRange(self, from_time_stamp, to_time_stamp):
         """
         update start and end time. time series extracted will be limited to
-        this period
+        this period. the time axis loaded at start up is reused.
 
         Parameters
         ----------
@@ -151,7 +342,7 @@ class Res1D:
 
 
     def _get_element_data_frame(self, elements, element_IDs, extraction_IDs,
-                            quantity_IDs):
+                            quantity_IDs, element_kind='element'):
         """
         generic method to extract data from elements. 
 
@@ -165,6 +356,9 @@ class Res1D:
             list of element IDs to extract data
         quantity_IDs : list
             list of quantities to extract data
+        element_kind : str, optional
+            element type used in extraction cache keys. The default is 
+            'element'.
 
         Returns
         -------
@@ -178,22 +372,82 @@ class Res1D:
         df_elem = {}
         for quantity_ID in quantity_IDs:
             df_elem[quantity_ID] = []
+        requests = []
         for name in extraction_IDs:
             element_ref = self._create_default_element_ref(
                 name, elements, element_IDs[name])
             for di in element_ref.data_items:
                 quantity_ID = di.Quantity.Id
                 if quantity_ID in quantity_IDs:
-                    data = self._get_data_item_array(di)
-                    column_count = self._get_data_column_count(data)
-                    chainages = None
-                    if column_count > 1:
-                        chainages = self._get_element_chainages(
-                            element_ref.element, column_count, name)
-                    d = self._data_array_to_frame(
-                        name, data, chainages, strict_chainages=True)
-                    df_elem[quantity_ID].append(d)
-        return self._finalize_quantity_frames(df_elem)
+                    requests.append((
+                        name, element_kind, quantity_ID, None,
+                        lambda name=name, element_ref=element_ref, di=di:
+                            self._default_data_item_to_array(
+                                name, element_ref, di)))
+        for request, d in zip(requests, self._get_cached_arrays(requests)):
+            name, _, quantity_ID, _, _ = request
+            df_elem[quantity_ID].append((name, *d))
+        return self._finalize_quantity_arrays(df_elem)
+
+
+    def _default_data_item_to_array(self, name, element_ref, data_item):
+        data = self._get_data_item_array(data_item)
+        column_count = self._get_data_column_count(data)
+        chainages = None
+        if column_count > 1:
+            chainages = self._get_element_chainages(
+                element_ref.element, column_count, name)
+        return self._check_data_array(
+            name, data, chainages, strict_chainages=True)
+
+
+    def _get_cached_arrays(self, requests):
+        """
+        get the data arrays of elements from the extraction cache, one 
+        cache entry per element type and quantity. missing elements are 
+        extracted from the res1d file and saved to the cache.
+
+        Parameters
+        ----------
+        requests : list
+            (name, element_kind, quantity_ID, chainage, extract) per element
+            and quantity. chainage is the chainage of the element or the 
+            requested chainages, extract returns the data array and 
+            chainages from the res1d file, see _check_data_array.
+
+        Returns
+        -------
+        list
+            per request, 2-D data array of the full time axis, one column 
+            per gridpoint, and list of chainages or None for a single column.
+
+        """
+        if self.cache is None:
+            return [extract() for *_, extract in requests]
+
+        positions = {}
+        for k, (_, element_kind, quantity_ID, _, _) in enumerate(requests):
+            positions.setdefault((element_kind, quantity_ID), []).append(k)
+
+        results = [None] * len(requests)
+        for (element_kind, quantity_ID), group in positions.items():
+            cached = self.cache.get(
+                self._file_fingerprint, element_kind, quantity_ID,
+                [(requests[k][0], requests[k][3]) for k in group])
+            missing = []
+            for k, d in zip(group, cached):
+                if d is None:
+                    missing.append(k)
+                else:
+                    results[k] = self._check_data_array(requests[k][0], *d)
+            for k in missing:
+                results[k] = requests[k][4]()
+            if missing:
+                self.cache.put(
+                    self._file_fingerprint, element_kind, quantity_ID,
+                    [(requests[k][0], requests[k][3], *results[k])
+                     for k in missing])
+        return results
 
 
     def _create_default_element_ref(self, name, elements, element_index):
@@ -209,19 +463,36 @@ class Res1D:
         """
         Get a numpy-compatible time-series array from a res1d data item.
         """
+        self._ensure_data_loaded()
         if element_index is not None:
             try:
-                data = np.asarray(data_item.CreateTimeSeriesData(element_index))
+                data = self._dotnet_to_numpy(
+                    data_item.CreateTimeSeriesData(element_index))
                 if data.ndim > 0:
                     return data
             except Exception:
                 pass
-        data = np.asarray(data_item.CreateDataArray())
+        data = self._dotnet_to_numpy(data_item.CreateDataArray())
         if element_index is not None and data.ndim > 1:
             return data[:, element_index]
         return data
 
 
+    def _dotnet_to_numpy(self, array):
+        """
+        convert a .NET array to numpy. bulk memory transfer is used when 
+        available, otherwise pythonnet converts element by element.
+        """
+        data = None
+        try:
+            data = _dotnet_array_to_numpy(array)
+        except Exception:
+            pass
+        if data is None:
+            data = np.asarray(array)
+        return data
+
+
     def _get_data_column_count(self, data):
         data = np.asarray(data)
         if data.ndim <= 1:
@@ -248,47 +519,81 @@ class Res1D:
             f"{len(chainages)} chainages")
 
 
-    def _data_array_to_frame(
+    def _check_data_array(
             self, name, data, chainages=None, strict_chainages=False):
+        """
+        2-D data array of one element and the chainages of its columns. a
+        single column without chainages is labelled by the element name only,
+        otherwise columns are labelled (name, chainage).
+        """
         data = np.asarray(data)
         if data.ndim == 1:
             data = data.reshape(-1, 1)
-        d = pd.DataFrame(data)
-        if d.shape[1] == 1:
-            d.columns = [name]
-            return d
+        # a single column keeps its chainage if it is one gridpoint of many
+        if data.shape[1] == 1 and chainages is None:
+            return data, None
 
-        if chainages is None or len(chainages) != d.shape[1]:
+        if chainages is None or len(chainages) != data.shape[1]:
             if strict_chainages:
                 chainage_count = 0 if chainages is None else len(chainages)
                 raise Exception(
                     f"At {name}, we cannot match chainages with data items. "
-                    f"There are {d.shape[1]} columns and "
+                    f"There are {data.shape[1]} columns and "
                     f"{chainage_count} chainages")
-            chainages = range(d.shape[1])
-
-        d.columns = pd.MultiIndex.from_tuples(
-            [(name, chainage) for chainage in chainages])
-        d.columns = d.columns.set_names(['muid', 'chainage'])
-        return d
-
-
-    def _data_item_to_frame(
-            self, name, data_item, chainages=None, element_index=None,
-            strict_chainages=False):
-        data = self._get_data_item_array(data_item, element_index)
-        return self._data_array_to_frame(
-            name, data, chainages, strict_chainages)
-
-
-    def _finalize_quantity_frames(self, df_elem):
-        for df in df_elem:
-            if len(df_elem[df]) > 0:
-                df_elem[df] = pd.concat(df_elem[df], axis = 1)
-                if df_elem[df].size > 0:
-                    df_elem[df] = df_elem[df].iloc[self.time_stamp_indices]
-                    df_elem[df].index = self.df_time_stamps
-            else:
-                df_elem[df] = pd.DataFrame(index = self.df_time_stamps)
+            chainages = range(data.shape[1])
+
+        return data, list(chainages)
+
+
+    def _finalize_quantity_arrays(self, df_elem):
+        """
+        write the arrays of each quantity into one preallocated block within 
+        the time window, and label its columns once.
+
+        Parameters
+        ----------
+        df_elem : dict
+            lists of (name, data, chainages) by quantity, see 
+            _check_data_array.
+
+        Returns
+        -------
+        dict
+            dictionary of pandas data frames. one df per quantity.
+
+        """
+        for quantity_ID, parts in df_elem.items():
+            if len(parts) == 0:
+                df_elem[quantity_ID] = pd.DataFrame(index=self.df_time_stamps)
+                continue
+
+            column_count = sum(data.shape[1] for _, data, _ in parts)
+            values = np.empty(
+                (len(self.df_time_stamps), column_count),
+                dtype=np.result_type(*[data.dtype for _, data, _ in parts]))
+            labels = []
+            k = 0
+            for name, data, chainages in parts:
+                values[:, k:k + data.shape[1]] = data[self.time_stamp_indices]
+                k += data.shape[1]
+                if chainages is None:
+                    labels.append(name)
+                else:
+                    labels.extend((name, chainage) for chainage in chainages)
+
+            df_elem[quantity_ID] = pd.DataFrame(
+                values, index=self.df_time_stamps,
+                columns=self._get_quantity_columns(parts, labels), copy=False)
         return df_elem
+
+
+    def _get_quantity_columns(self, parts, labels):
+        with_chainages = [chainages is not None for _, _, chainages in parts]
+        if all(with_chainages):
+            return pd.MultiIndex.from_tuples(
+                labels, names=['muid', 'chainage'])
+        if any(with_chainages):
+            # names and (name, chainage) tuples in one flat index
+            return pd.Index(labels, dtype=object, tupleize_cols=False)
+        return pd.Index(labels)
     
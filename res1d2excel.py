@@ -47,6 +47,8 @@ def create_collections(
     if len(combined_collection) > 0:
         element_collections.append(combined_collection)
     xlsx_dict = input_dataframes.create_excel_collection_from_dataframes(output_files_dfs)
+    for collection in element_collections:
+        collection.set_stats_selection(xlsx_dict['statistics'])
 
     return [res1d_dict, element_collections, xlsx_dict]
 
@@ -95,13 +97,27 @@ def main():
     [res1d_dict, element_collections, xlsx_dict] = create_collections(dfs_list)
     print("Finished reading configuration files.")
     
+    # validate res1d files
+    print("Validating res1d files ...")
+    res1d_extractors.validate_res1d_files(
+        res1d_dict,
+        xlsx_dict['skip_time'],
+        xlsx_dict['trunc_time']
+        )
+
     # extract ts
     print("Extracting res1d files ...")
     res1d_extractors.batch_res1d_extractor(
         res1d_dict,
         element_collections,
         xlsx_dict['skip_time'],
-        xlsx_dict['trunc_time']
+        xlsx_dict['trunc_time'],
+        xlsx_dict['selective_load'],
+        xlsx_dict['cache_dir'],
+        xlsx_dict['cache_size_gb'],
+        xlsx_dict['workers'],
+        xlsx_dict['prefetch_depth'],
+        xlsx_dict['prefetch_memory_gb']
         )
     res1d_extractors.update_combined_element_collections(element_collections)
     print("Finished extracting res1d files. ")
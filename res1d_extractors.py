@@ -5,9 +5,16 @@
 # this module extracts time seris from one Res1D class and add to
 # SimpleElementCollection instances
 
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 import element_collection
 import pandas as pd
 import combined_element
+import extraction_cache
+import res1d
 import res1d_network
 import res1d_runoff
 
@@ -16,7 +23,13 @@ def batch_res1d_extractor(
         res1d_dict,
         elem_collection_list,
         skip_time=None,
-        trunc_time=None
+        trunc_time=None,
+        selective_load=False,
+        cache_dir=None,
+        cache_size_gb=None,
+        workers=None,
+        prefetch_depth=0,
+        prefetch_memory_gb=None
         ):
     """
     enumerate through res1d file dictionary and extract data according
@@ -34,26 +47,400 @@ def batch_res1d_extractor(
     trunc_time : str, optional
         pandas-compatible duration to remove from the end of each result file,
         e.g. '6h' or '30min'. The default is None.
+    selective_load : bool, optional
+        only load data of the elements listed in the element collections.
+        The default is False.
+    cache_dir : str, optional
+        folder of the on-disk extraction cache. extracted time series are
+        reused in later runs while res1d files are unchanged. The default is
+        None, i.e. no cache.
+    cache_size_gb : float, optional
+        size limit of the extraction cache in GB. The default is None, i.e.
+        ExtractionCache.DEFAULT_MAX_BYTES.
+    workers : int, optional
+        number of worker processes. each worker loads its own res1d files
+        and sends extracted arrays back. The default is None, i.e. extract 
+        in this process.
+    prefetch_depth : int, optional
+        number of res1d files a background thread loads ahead of extraction.
+        only used without workers. The default is 0, i.e. no prefetch.
+    prefetch_memory_gb : float, optional
+        limit of res1d file sizes resident at the same time, in GB. a file
+        is always loaded if no other file is resident. The default is None,
+        i.e. no limit.
 
     Returns
     -------
     None.
 
     """
-    if 'network' in res1d_dict:
-        for short_name, res1d_file_path in res1d_dict['network'].items():
-            print(f'Loading res1d file {res1d_file_path} ...')
-            res1d = res1d_network.Res1DNetwork(res1d_file_path)
-            apply_time_range(res1d, skip_time, trunc_time)
-            print(f'Extracting data from res1d file {short_name} ...')
-            res1d_extractor(short_name, res1d, elem_collection_list)
-    if 'runoff' in res1d_dict:
-        for short_name, res1d_file_path in res1d_dict['runoff'].items():
+    load_request = None
+    if selective_load:
+        load_request = create_load_request(elem_collection_list)
+
+    if workers is not None and int(workers) > 1:
+        parallel_res1d_extractor(
+            res1d_dict, elem_collection_list, int(workers), skip_time,
+            trunc_time, load_request, cache_dir, cache_size_gb)
+        return
+
+    cache = create_extraction_cache(cache_dir, cache_size_gb)
+    max_bytes = None
+    if prefetch_memory_gb:
+        max_bytes = int(float(prefetch_memory_gb) * 1024 ** 3)
+
+    for short_name, res1d_file in iter_res1d_files(
+            get_res1d_tasks(res1d_dict), load_request, cache,
+            int(prefetch_depth or 0), max_bytes):
+        apply_time_range(res1d_file, skip_time, trunc_time)
+        print(f'Extracting data from res1d file {short_name} ...')
+        res1d_extractor(short_name, res1d_file, elem_collection_list)
+        del res1d_file
+
+    if cache is not None:
+        print(f'Extraction cache: {cache.hits} hits, {cache.misses} misses')
+        cache.evict()
+
+
+def get_res1d_tasks(res1d_dict):
+    """
+    list of (result_type, short_name, res1d_file_path), network files first
+    """
+    return [(result_type, short_name, res1d_file_path)
+            for result_type in ['network', 'runoff']
+            for short_name, res1d_file_path in res1d_dict.get(
+                    result_type, {}).items()]
+
+
+class _MemoryBudget:
+    """
+    bytes of res1d files resident at the same time. a file that does not
+    fit waits until other files are released, unless nothing is resident.
+    """
+
+    def __init__(self, max_bytes=None):
+        self._max_bytes = max_bytes
+        self._used_bytes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, n_bytes, stop_event):
+        with self._condition:
+            while (self._max_bytes is not None and self._used_bytes > 0 and
+                   self._used_bytes + n_bytes > self._max_bytes):
+                if stop_event.is_set():
+                    return False
+                self._condition.wait(0.1)
+            self._used_bytes += n_bytes
+            return True
+
+    def release(self, n_bytes):
+        with self._condition:
+            self._used_bytes -= n_bytes
+            self._condition.notify_all()
+
+
+def iter_res1d_files(tasks, load_request=None, cache=None, prefetch_depth=0,
+                     max_bytes=None):
+    """
+    open res1d files in task order. with prefetch_depth > 0, a background
+    thread loads the next files while the current one is extracted.
+
+    Parameters
+    ----------
+    tasks : list
+        list of (result_type, short_name, res1d_file_path).
+    load_request : res1d.LoadRequest, optional
+        elements and quantities to be loaded. The default is None.
+    cache : extraction_cache.ExtractionCache, optional
+        on-disk extraction cache. The default is None.
+    prefetch_depth : int, optional
+        number of files loaded ahead. The default is 0.
+    max_bytes : int, optional
+        limit of res1d file sizes resident at the same time. The default is
+        None, i.e. no limit.
+
+    Yields
+    ------
+    tuple
+        short name and Res1DNetwork or Res1DRunoff instance.
+
+    """
+    if prefetch_depth <= 0:
+        for result_type, short_name, res1d_file_path in tasks:
             print(f'Loading res1d file {res1d_file_path} ...')
-            res1d = res1d_runoff.Res1DRunoff(res1d_file_path)
-            apply_time_range(res1d, skip_time, trunc_time)
-            print(f'Extracting data from res1d file {short_name} ...')
-            res1d_extractor(short_name, res1d, elem_collection_list)
+            yield short_name, open_res1d(
+                result_type, res1d_file_path, load_request, cache)
+        return
+
+    budget = _MemoryBudget(max_bytes)
+    # the file being extracted and prefetch_depth files loaded ahead
+    resident_files = threading.Semaphore(prefetch_depth + 1)
+    loaded = queue.Queue(maxsize=prefetch_depth)
+    stop_event = threading.Event()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                loaded.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def prefetch():
+        for result_type, short_name, res1d_file_path in tasks:
+            # errors, also of missing files, are raised by the consumer
+            n_bytes = 0
+            while not resident_files.acquire(timeout=0.1):
+                if stop_event.is_set():
+                    return
+            try:
+                n_bytes = os.path.getsize(res1d_file_path)
+                if not budget.acquire(n_bytes, stop_event):
+                    return
+                print(f'Prefetching res1d file {res1d_file_path} ...')
+                res1d_file = open_res1d(
+                    result_type, res1d_file_path, load_request, cache)
+            except Exception as exc:
+                put((short_name, None, n_bytes, exc))
+                return
+            if not put((short_name, res1d_file, n_bytes, None)):
+                return
+            # the consumer holds the only reference, so the file is freed
+            # when its budget is released
+            res1d_file = None
+        put(None)
+
+    thread = threading.Thread(target=prefetch, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = loaded.get()
+            if item is None:
+                break
+            short_name, res1d_file, n_bytes, exc = item
+            item = None
+            if exc is not None:
+                raise exc
+            try:
+                yield short_name, res1d_file
+            finally:
+                del res1d_file
+                budget.release(n_bytes)
+                resident_files.release()
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def parallel_res1d_extractor(
+        res1d_dict,
+        elem_collection_list,
+        workers,
+        skip_time=None,
+        trunc_time=None,
+        load_request=None,
+        cache_dir=None,
+        cache_size_gb=None
+        ):
+    """
+    extract res1d files in a pool of worker processes. results are added to
+    element collections in file order, the same as serial extraction.
+
+    Parameters
+    ----------
+    res1d_dict : dictionary {short_name: file_path}
+        this dictionary holds collection of res1d file paths
+    elem_collection_list : list of element collections
+        list of element collections
+    workers : int
+        number of worker processes.
+    skip_time, trunc_time : str, optional
+        see batch_res1d_extractor.
+    load_request : res1d.LoadRequest, optional
+        elements and quantities to be loaded. The default is None.
+    cache_dir, cache_size_gb : optional
+        see batch_res1d_extractor.
+
+    Returns
+    -------
+    None.
+
+    """
+    extraction_specs = [get_extraction_spec(elem_collection)
+                        for elem_collection in elem_collection_list]
+    tasks = get_res1d_tasks(res1d_dict)
+    if not tasks:
+        return
+
+    print(f'Extracting {len(tasks)} res1d files with {workers} workers ...')
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = [
+            pool.submit(_extract_res1d_file, result_type, res1d_file_path,
+                        extraction_specs, load_request, skip_time,
+                        trunc_time, cache_dir, cache_size_gb)
+            for result_type, _, res1d_file_path in tasks]
+        for (_, short_name, _), future in zip(tasks, futures):
+            results = future.result()
+            print(f'Adding data from res1d file {short_name} ...')
+            for elem_collection, arrays in zip(elem_collection_list, results):
+                if arrays is None:
+                    continue
+                elem_collection.add_ts(
+                    {quantity_id: _arrays_to_frame(*frame_arrays)
+                     for quantity_id, frame_arrays in arrays.items()},
+                    short_name)
+                elem_collection.update_statistics()
+
+    # workers only add entries, the cache is trimmed once all are done
+    cache = create_extraction_cache(cache_dir, cache_size_gb)
+    if cache is not None:
+        cache.evict()
+
+
+def _extract_res1d_file(
+        result_type,
+        res1d_file_path,
+        extraction_specs,
+        load_request=None,
+        skip_time=None,
+        trunc_time=None,
+        cache_dir=None,
+        cache_size_gb=None
+        ):
+    """
+    worker process task: open one res1d file, extract time series of every
+    extraction spec and return them as (values, columns, time index) arrays
+    """
+    cache = create_extraction_cache(cache_dir, cache_size_gb)
+    res1d_file = open_res1d(result_type, res1d_file_path, load_request, cache)
+    apply_time_range(res1d_file, skip_time, trunc_time)
+
+    results = []
+    for spec in extraction_specs:
+        dfs = None if spec is None else extract_spec_ts(res1d_file, spec)
+        if dfs is None:
+            results.append(None)
+            continue
+        results.append({quantity_id: _frame_to_arrays(df)
+                        for quantity_id, df in dfs.items()})
+    return results
+
+
+def _frame_to_arrays(df):
+    return df.to_numpy(), df.columns, df.index.to_numpy()
+
+
+def _arrays_to_frame(values, columns, index):
+    return pd.DataFrame(values, index=pd.DatetimeIndex(index),
+                        columns=columns)
+
+
+def open_res1d(result_type, res1d_file_path, load_request=None, cache=None):
+    """
+    open a network or runoff res1d file. with an extraction cache, values 
+    are only loaded when a cache miss needs them.
+
+    Parameters
+    ----------
+    result_type : str
+        'network' or 'runoff'.
+    res1d_file_path : str
+        path to res1d file.
+    load_request : res1d.LoadRequest, optional
+        elements and quantities to be extracted. The default is None.
+    cache : extraction_cache.ExtractionCache, optional
+        on-disk extraction cache. The default is None.
+
+    Returns
+    -------
+    Res1DNetwork or Res1DRunoff
+
+    """
+    res1d_class = {
+        'network': res1d_network.Res1DNetwork,
+        'runoff': res1d_runoff.Res1DRunoff,
+    }[result_type]
+    return res1d_class(res1d_file_path, load_request,
+                       header_only=cache is not None, cache=cache)
+
+
+def create_extraction_cache(cache_dir=None, cache_size_gb=None):
+    """
+    create an on-disk extraction cache, or None if cache_dir is not set
+    """
+    if not cache_dir:
+        return None
+    if not cache_size_gb:
+        return extraction_cache.ExtractionCache(cache_dir)
+    return extraction_cache.ExtractionCache(
+        cache_dir, int(float(cache_size_gb) * 1024 ** 3))
+
+
+def validate_res1d_files(res1d_dict, skip_time=None, trunc_time=None):
+    """
+    open the header of every res1d file and check that skip_time and 
+    trunc_time fit in its time span. only the header and time axis are 
+    read, no element index is built and no values are loaded.
+
+    Parameters
+    ----------
+    res1d_dict : dictionary {short_name: file_path}
+        this dictionary holds collection of res1d file paths
+    skip_time : str, optional
+        pandas-compatible duration to remove from the beginning.
+    trunc_time : str, optional
+        pandas-compatible duration to remove from the end.
+
+    Raises
+    ------
+    ValueError
+        skip_time and trunc_time exceed the time span of a file.
+
+    Returns
+    -------
+    None.
+
+    """
+    if (parse_time_delta(skip_time, 'skip_time') == pd.Timedelta(0) and
+            parse_time_delta(trunc_time, 'trunc_time') == pd.Timedelta(0)):
+        return
+
+    for result_type in ['network', 'runoff']:
+        for short_name, res1d_file_path in res1d_dict.get(
+                result_type, {}).items():
+            res1d_header = res1d.Res1D(res1d_file_path, header_only=True)
+            try:
+                apply_time_range(res1d_header, skip_time, trunc_time)
+            except ValueError as exc:
+                raise ValueError(f'{short_name}: {exc}') from exc
+
+
+def create_load_request(elem_collection_list):
+    """
+    collect element IDs and quantities to be extracted, by element type
+
+    Parameters
+    ----------
+    elem_collection_list : list of element collections
+        list of element collections
+
+    Returns
+    -------
+    res1d.LoadRequest
+
+    """
+    load_request = res1d.LoadRequest()
+    for elem_collection in elem_collection_list:
+        if not isinstance(elem_collection,
+                          element_collection.ElementCollection):
+            continue
+        if is_calculated_collection(elem_collection):
+            continue
+        load_request.add(elem_collection.get_element_type(),
+                         elem_collection.get_all_element_ids(),
+                         elem_collection.get_quantity_ids())
+    return load_request
 
 
 def parse_time_delta(value, name):
@@ -199,19 +586,53 @@ def extract_element_ts(res1d, elem_collection):
 
     Returns
     -------
-    dfs : TYPE
-        DESCRIPTION.
+    dfs : dict
+        dictionary of pandas data frames. one df per quantity.
+
+    """
+    spec = get_extraction_spec(elem_collection)
+    if spec is None:
+        return None
+    return extract_spec_ts(res1d, spec)
+
 
+def get_extraction_spec(elem_collection):
+    """
+    element type, element IDs, quantity IDs and chainages by element ID to
+    be extracted for an element collection, or None if it is not extracted 
+    from res1d files
     """
     if not isinstance(elem_collection,
                       element_collection.ElementCollection):
         return None
     if is_calculated_collection(elem_collection):
         return None
-    element_type = elem_collection.get_element_type()
-    quantity_ids = elem_collection.get_quantity_ids()
-    element_ids = elem_collection.get_all_element_ids()
-    
+    return (elem_collection.get_element_type(),
+            elem_collection.get_all_element_ids(),
+            elem_collection.get_quantity_ids(),
+            elem_collection.get_element_chainages())
+
+
+def extract_spec_ts(res1d, spec):
+    """
+    extract data from res1d according to an extraction spec
+
+    Parameters
+    ----------
+    res1d : Res1DNetwork or Res1DRunoff
+        instance of res1d class.
+    spec : tuple
+        element type, element IDs, quantity IDs and chainages by element ID.
+        network elements with several gridpoints are only extracted at the
+        gridpoints nearest to these chainages.
+
+    Returns
+    -------
+    dfs : dict
+        dictionary of pandas data frames. one df per quantity.
+
+    """
+    element_type, element_ids, quantity_ids, chainages = spec
     dfs = None
 
     if isinstance(res1d, res1d_network.Res1DNetwork):
@@ -219,24 +640,32 @@ def extract_element_ts(res1d, elem_collection):
             case 'node':
                 dfs = res1d.get_node_data_frames(element_ids, quantity_ids)
             case 'link':
-                dfs = res1d.get_reach_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_reach_data_frames(
+                    element_ids, quantity_ids, chainages)
             case'orifice':
-                dfs = res1d.get_orifice_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_orifice_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'pump':
-                dfs = res1d.get_pump_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_pump_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'regulation':
-                dfs = res1d.get_regulation_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_regulation_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'weir':
-                dfs = res1d.get_weir_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_weir_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'valve':
-                dfs = res1d.get_valve_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_valve_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'bridge':
-                dfs = res1d.get_bridge_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_bridge_data_frames(
+                    element_ids, quantity_ids, chainages)
             case 'direct_discharge':
                 dfs = res1d.get_direct_discharge_data_frames(
-                    element_ids, quantity_ids)
+                    element_ids, quantity_ids, chainages)
             case 'gate':
-                dfs = res1d.get_gate_data_frames(element_ids, quantity_ids)
+                dfs = res1d.get_gate_data_frames(
+                    element_ids, quantity_ids, chainages)
     
     if isinstance(res1d, res1d_runoff.Res1DRunoff):
         dfs = res1d.get_catchment_data_frames(element_ids, quantity_ids)
@@ -7,6 +7,7 @@
 import re
 from dataclasses import dataclass, field
 
+import numpy as np
 import pandas as pd
 
 import res1d
@@ -53,6 +54,9 @@ class Res1DNetwork(res1d.Res1D):
         'DischargeInStructure', 'CrestLevel', 'ValveOpening',
         'GateLevel', 'ControlStrategyId'
     ]
+    # same as ElementCollection.CHAINAGE_LAST
+    CHAINAGE_LAST = -1
+
     DEFAULT_STRUCTURE_QUANTITIES = [
         'WaterLevel', 'Discharge', 'DischargeInStructure',
         'ControlStrategyId'
@@ -69,7 +73,8 @@ class Res1DNetwork(res1d.Res1D):
     _direct_discharge_quantity_IDs = []
     _gate_quantity_IDs = []
 
-    def __init__(self, file_path):
+    def __init__(self, file_path, load_request=None, header_only=False,
+                 cache=None):
         """
         initiate instance. read from res1d file and load properties
 
@@ -77,13 +82,22 @@ class Res1DNetwork(res1d.Res1D):
         ----------
         file_path : str
             path to res1d file.
+        load_request : res1d.LoadRequest, optional
+            elements and quantities to be extracted. only data of these 
+            elements is loaded. The default is None, i.e. load all data.
+        header_only : bool, optional
+            build the element index and time axis without loading values.
+            values are loaded on the first extraction call. The default is 
+            False.
+        cache : extraction_cache.ExtractionCache, optional
+            on-disk cache of extracted time series. The default is None.
 
         Returns
         -------
         None.
 
         """
-        super().__init__(file_path)
+        super().__init__(file_path, load_request, header_only, cache)
         self.node_IDs = {}
         self.reach_IDs = {}
         self.weir_IDs = {}
@@ -100,6 +114,8 @@ class Res1DNetwork(res1d.Res1D):
         self._build_node_index()
         self._build_reach_and_structure_index()
         self._collect_quantity_ids()
+        if not header_only:
+            self._ensure_data_loaded()
 
         self.node_count = len(self.node_IDs)
         self.reach_count = len(self.reach_IDs)
@@ -141,6 +157,37 @@ class Res1DNetwork(res1d.Res1D):
             self.direct_discharge_IDs)
         self._gate_quantity_IDs = self._get_ref_quantities(self.gate_IDs)
 
+    def _load_requested_data(self, load_request):
+        """
+        load data of requested elements only. sewer structures, regulations
+        and river structures are stored in reaches, so their reaches are
+        loaded.
+        """
+        nodes = set()
+        reaches = set()
+        for element_type in load_request.get_element_types():
+            element_IDs = self._get_element_type_dict(element_type)
+            if element_IDs is None:
+                continue
+            quantity_IDs = load_request.quantity_ids[element_type]
+            for muid in load_request.element_ids[element_type]:
+                ref = element_IDs.get(muid)
+                if ref is None or quantity_IDs.isdisjoint(
+                        ref.data_items_by_quantity):
+                    continue
+                if ref.collection_name == 'Nodes':
+                    nodes.add(ref.muid)
+                else:
+                    reaches.add(self._get_ref_element(ref).Name)
+        self._load_filtered_data(nodes=nodes, reaches=reaches)
+
+    def _get_element_type_dict(self, element_type):
+        if element_type == 'node':
+            return self.node_IDs
+        if element_type == 'link':
+            return self.reach_IDs
+        return self._get_structure_type_dict(element_type)
+
     def _get_ref_quantities(self, element_IDs):
         qs = []
         for ref in element_IDs.values():
@@ -348,48 +395,116 @@ class Res1DNetwork(res1d.Res1D):
         collection = getattr(self.result_data, ref.collection_name)
         return collection.get_Item(ref.collection_index)
 
-    def _get_ref_data_frames(self, element_IDs, extraction_IDs, quantity_IDs):
+    def _get_ref_data_frames(self, element_IDs, extraction_IDs, quantity_IDs,
+                             chainages=None):
+        """
+        extract time series of elements, one data frame per quantity.
+        chainages maps element IDs to requested chainages. elements with 
+        several gridpoints are then only extracted at the gridpoints nearest
+        to them, otherwise at all gridpoints.
+        """
         extraction_IDs = utilities.list_cleanup(extraction_IDs)
         extraction_IDs = [eId for eId in extraction_IDs if eId in element_IDs]
+        chainages = chainages or {}
 
         df_elem = {}
         for quantity_ID in quantity_IDs:
             df_elem[quantity_ID] = []
 
+        requests = []
         for name in extraction_IDs:
             ref = element_IDs[name]
+            requested = chainages.get(name)
             for quantity_ID in quantity_IDs:
                 data_ref = ref.data_items_by_quantity.get(quantity_ID)
                 if data_ref is None:
                     continue
-                d = self._ref_data_item_to_frame(name, ref, data_ref)
-                df_elem[quantity_ID].append(d)
+                requests.append((
+                    name, ref.element_type, quantity_ID,
+                    ref.chainage if requested is None else requested,
+                    lambda name=name, ref=ref, data_ref=data_ref,
+                           requested=requested:
+                        self._ref_data_item_to_array(
+                            name, ref, data_ref, requested)))
+
+        for request, d in zip(requests, self._get_cached_arrays(requests)):
+            name, _, quantity_ID, _, _ = request
+            df_elem[quantity_ID].append((name, *d))
 
-        return self._finalize_quantity_frames(df_elem)
+        return self._finalize_quantity_arrays(df_elem)
 
-    def _ref_data_item_to_frame(self, name, ref, data_ref):
+    def _ref_data_item_to_array(self, name, ref, data_ref, requested=None):
         chainages = None
         if data_ref.element_index is None:
             element = self._get_ref_element(ref)
+            if requested is not None:
+                d = self._ref_data_item_columns_to_array(
+                    name, ref, data_ref, requested)
+                if d is not None:
+                    return d
             data = self._get_data_item_array(data_ref.data_item)
             column_count = self._get_data_column_count(data)
             if column_count > 1:
-                if ref.source_kind != 'river_structure_data_item':
-                    chainages = self._get_element_chainages(
-                        element, column_count, name)
-                else:
-                    chainages = self._get_structure_data_item_chainages(
-                        ref, data_ref.data_item)
-            return self._data_array_to_frame(
+                chainages = self._get_ref_chainages(
+                    name, ref, element, data_ref.data_item, column_count)
+            return self._check_data_array(
                 name,
                 data,
                 chainages,
                 strict_chainages=(
                     ref.source_kind != 'river_structure_data_item'))
-        return self._data_item_to_frame(
+        return self._check_data_array(
             name,
-            data_ref.data_item,
-            element_index=data_ref.element_index)
+            self._get_data_item_array(
+                data_ref.data_item, data_ref.element_index))
+
+    def _ref_data_item_columns_to_array(self, name, ref, data_ref, requested):
+        """
+        extract only the gridpoints nearest to the requested chainages, one
+        CreateTimeSeriesData call per gridpoint. None if the number of
+        gridpoints of the data item is not known, or chainages do not match.
+        """
+        column_count = self._get_data_item_element_count(data_ref.data_item)
+        if column_count is None or column_count <= 1:
+            return None
+        chainages = self._get_ref_chainages(
+            name, ref, self._get_ref_element(ref), data_ref.data_item,
+            column_count)
+        if chainages is None or len(chainages) != column_count:
+            return None
+
+        columns = self._find_nearest_columns(chainages, requested)
+        data = np.column_stack([
+            self._get_data_item_array(data_ref.data_item, element_index=k)
+            for k in columns])
+        return self._check_data_array(
+            name, data, [chainages[k] for k in columns])
+
+    def _get_data_item_element_count(self, data_item):
+        try:
+            return int(data_item.NumberOfElements)
+        except Exception:
+            return None
+
+    def _find_nearest_columns(self, chainages, requested):
+        """
+        sorted positions of the chainages nearest to the requested ones. 
+        CHAINAGE_LAST selects the last gridpoint.
+        """
+        chainages = np.asarray(chainages, dtype=float)
+        columns = set()
+        for chainage in requested:
+            if chainage == self.CHAINAGE_LAST:
+                columns.add(len(chainages) - 1)
+            else:
+                # first of equally near chainages, like min()
+                columns.add(int(np.argmin(np.abs(chainages - chainage))))
+        return sorted(columns)
+
+    def _get_ref_chainages(self, name, ref, element, data_item, column_count):
+        if ref.source_kind != 'river_structure_data_item':
+            return self._get_element_chainages(element, column_count, name)
+        return self._get_structure_data_item_chainages(ref, data_item)
 
     def _get_structure_data_item_chainages(self, ref, data_item):
         element = self._get_ref_element(ref)
@@ -422,79 +537,98 @@ class Res1DNetwork(res1d.Res1D):
             self.node_IDs, extraction_IDs, quantity_IDs)
 
     def get_reach_data_frames(self, extraction_IDs,
-                 quantity_IDs = _reach_quantity_IDs):
+                 quantity_IDs = _reach_quantity_IDs,
+                 chainages=None):
         """
         extract time series from reaches.
         """
         return self._get_ref_data_frames(
-            self.reach_IDs, extraction_IDs, quantity_IDs)
+            self.reach_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_orifice_data_frames(self, extraction_IDs,
-                 quantity_IDs = _orifice_quantity_IDs):
+                 quantity_IDs = _orifice_quantity_IDs,
+                 chainages=None):
         """
         extract time series from orifices.
         """
         return self._get_ref_data_frames(
-            self.orifice_IDs, extraction_IDs, quantity_IDs)
+            self.orifice_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_pump_data_frames(self, extraction_IDs,
-                 quantity_IDs = _pump_quantity_IDs):
+                 quantity_IDs = _pump_quantity_IDs,
+                 chainages=None):
         """
         extract time series from pumps.
         """
         return self._get_ref_data_frames(
-            self.pump_IDs, extraction_IDs, quantity_IDs)
+            self.pump_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_regulation_data_frames(self, extraction_IDs,
-                 quantity_IDs = _regulation_quantity_IDs):
+                 quantity_IDs = _regulation_quantity_IDs,
+                 chainages=None):
         """
         extract time series from regulations.
         """
         return self._get_ref_data_frames(
-            self.regulation_IDs, extraction_IDs, quantity_IDs)
+            self.regulation_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_weir_data_frames(self, extraction_IDs,
-                 quantity_IDs = _weir_quantity_IDs):
+                 quantity_IDs = _weir_quantity_IDs,
+                 chainages=None):
         """
         extract time series from weirs.
         """
         return self._get_ref_data_frames(
-            self.weir_IDs, extraction_IDs, quantity_IDs)
+            self.weir_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_valve_data_frames(self, extraction_IDs,
-                 quantity_IDs = _valve_quantity_IDs):
+                 quantity_IDs = _valve_quantity_IDs,
+                 chainages=None):
         """
         extract time series from valves.
         """
         return self._get_ref_data_frames(
-            self.valve_IDs, extraction_IDs, quantity_IDs)
+            self.valve_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_bridge_data_frames(self, extraction_IDs,
-                 quantity_IDs = _bridge_quantity_IDs):
+                 quantity_IDs = _bridge_quantity_IDs,
+                 chainages=None):
         """
         extract time series from bridges.
         """
         return self._get_ref_data_frames(
-            self.bridge_IDs, extraction_IDs, quantity_IDs)
+            self.bridge_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_direct_discharge_data_frames(self, extraction_IDs,
-                 quantity_IDs = _direct_discharge_quantity_IDs):
+                 quantity_IDs = _direct_discharge_quantity_IDs,
+                 chainages=None):
         """
         extract time series from direct discharge structures.
         """
         return self._get_ref_data_frames(
-            self.direct_discharge_IDs, extraction_IDs, quantity_IDs)
+            self.direct_discharge_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_gate_data_frames(self, extraction_IDs,
-                 quantity_IDs = _gate_quantity_IDs):
+                 quantity_IDs = _gate_quantity_IDs,
+                 chainages=None):
         """
         extract time series from gates.
         """
         return self._get_ref_data_frames(
-            self.gate_IDs, extraction_IDs, quantity_IDs)
+            self.gate_IDs, extraction_IDs, quantity_IDs,
+            chainages)
 
     def get_structure_data_frames(
-            self, extraction_IDs, quantity_IDs = DEFAULT_STRUCTURE_QUANTITIES):
+            self, extraction_IDs, quantity_IDs = DEFAULT_STRUCTURE_QUANTITIES,
+            chainages=None):
         """
         extract time series from structures.
         """
@@ -510,7 +644,8 @@ class Res1DNetwork(res1d.Res1D):
                 ('bridge', self.get_bridge_data_frames),
                 ('direct_discharge', self.get_direct_discharge_data_frames),
                 ('gate', self.get_gate_data_frames)]:
-            dfs[structure_type] = getter(extraction_IDs, quantity_IDs)
+            dfs[structure_type] = getter(
+                extraction_IDs, quantity_IDs, chainages)
 
         quantity_IDs = list(
             set.union(*[set(list(df.keys())) for df in dfs.values()])
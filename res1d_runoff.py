@@ -15,7 +15,8 @@ class Res1DRunoff(res1d.Res1D):
     _catchment_quantity_IDs = []
     
     
-    def __init__(self, file_path):
+    def __init__(self, file_path, load_request=None, header_only=False,
+                 cache=None):
         """
         initiate instance. read from res1d file and load properties
 
@@ -23,17 +24,43 @@ class Res1DRunoff(res1d.Res1D):
         ----------
         file_path : str
             path to res1d file.
+        load_request : res1d.LoadRequest, optional
+            elements and quantities to be extracted. only data of these 
+            catchments is loaded. The default is None, i.e. load all data.
+        header_only : bool, optional
+            build the element index and time axis without loading values.
+            values are loaded on the first extraction call. The default is 
+            False.
+        cache : extraction_cache.ExtractionCache, optional
+            on-disk cache of extracted time series. The default is None.
 
         Returns
         -------
         None.
 
         """
-        super().__init__(file_path)
+        super().__init__(file_path, load_request, header_only, cache)
         self.catchment_IDs = self._get_element_IDs()
         self.catchment_count = len(self.catchment_IDs)
         self._catchment_quantity_IDs = [
             q.Id for q in self.result_data.Quantities]
+        if not header_only:
+            self._ensure_data_loaded()
+        
+    
+    def _load_requested_data(self, load_request):
+        """
+        load data of requested catchments and their sub catchments only.
+        all element types are matched against catchment IDs, the same as in
+        extraction.
+        """
+        catchments = set()
+        for element_IDs in load_request.element_ids.values():
+            for cId in element_IDs:
+                for suffix in self._runoffSubCatchSuffix:
+                    if cId + suffix in self.catchment_IDs:
+                        catchments.add(cId + suffix)
+        self._load_filtered_data(catchments=catchments)
         
         
     def _get_element_IDs(self):
@@ -82,7 +109,8 @@ class Res1DRunoff(res1d.Res1D):
         
         dfs = self._get_element_data_frame(self.result_data.Catchments, 
                                            self.catchment_IDs, 
-                                          extraction_IDs, quantity_IDs)
+                                          extraction_IDs, quantity_IDs,
+                                          'catchment')
                 
         return dfs
 
@@ -19,7 +19,16 @@ const data = {
         trunc_time: "",
         export_by_element: false,
         export_by_result_file: false,
-        export_statistics: false
+        export_statistics: false,
+        // options without controls on the output files tab, kept as loaded
+        selective_load: false,
+        cache_dir: "",
+        cache_size_gb: null,
+        workers: null,
+        prefetch_depth: null,
+        prefetch_memory_gb: null,
+        statistics: null,
+        statistics_by: {}
     },
 
     res1d_files: []
@@ -45,7 +54,7 @@ const defaultSchemas = {
 
 const combinedSources = [
     "catchment", "node", "link", "orifice", "pump", "regulation",
-    "weir", "valve", "bridge", "direct_discharge", "gate"
+    "weir", "valve", "bridge", "direct_discharge", "gate", "combined"
 ];
 
 let currentTab = "";
@@ -287,7 +296,9 @@ function updateOutputFiles() {
         truncTime = `${truncValue} ${truncUnit}`;
     }
 
+    // keep options that are not edited on this tab
     data.output_files = {
+        ...data.output_files,
         output_folder: document.getElementById("of-folder").value,
         resample_interval: resample,
         skip_time: skipTime,
@@ -10,11 +10,14 @@
 import pandas as pd
 from typing import Optional
 from base_element import BaseElement
+from timeseries_store import TimeSeriesBlock, TimeSeriesColumn
 import statistics_calculator
 
 
 class SimpleElement(BaseElement):
     
+    __slots__ = ()
+
     def __init__(
         self,
         element_id: str,
@@ -43,7 +46,23 @@ class SimpleElement(BaseElement):
         if ts_name in self._timeseries and not overwrite:
             raise ValueError(f"Timeseries '{ts_name}' already exists")
 
-        self._timeseries[ts_name] = ts.copy()
+        self._set_ts(ts_name, TimeSeriesColumn(TimeSeriesBlock.from_series(ts)))
+
+    def add_ts_column(
+        self,
+        ts_name: str,
+        block: TimeSeriesBlock,
+        column: int,
+        overwrite: bool = True
+    ) -> None:
+        """
+        Add a time series as a column reference into a shared block.
+        No data is copied.
+        """
+        if ts_name in self._timeseries and not overwrite:
+            raise ValueError(f"Timeseries '{ts_name}' already exists")
+
+        self._set_ts(ts_name, TimeSeriesColumn(block, column))
 
     def update_ts(self, *args, **kwargs) -> None:
         """
@@ -69,8 +88,14 @@ class SimpleElement(BaseElement):
     # Statistics (reuse base)
     # -------------------------
 
-    def update_statistics(self, calculator=None) -> None:
-        super().update_statistics(calculator or statistics_calculator)
+    def update_statistics(
+        self,
+        calculator=None,
+        recompute: bool = False,
+        stat_names: Optional[tuple] = None
+    ) -> None:
+        super().update_statistics(
+            calculator or statistics_calculator, recompute, stat_names)
 
     
 def test_element():
@@ -3,11 +3,24 @@
 # Author: Yi Wang
 # this module includes functions to calculate statistics for data frames
 
+import builtins
+from dataclasses import dataclass
+import re
+from typing import Callable
+
 import numpy as np
 import pandas as pd
 
 default_window = '1h'
 
+# rolling mean windows of the max_<window> and min_<window> statistics in 
+# get_all_stats, e.g. ['15min', '1H', '6H', '24H']
+block_windows = ['1H', '24H']
+
+# cells of a block converted to float64 at once by get_stats_block. 
+# intermediates of the same size are calculated per chunk of columns.
+CHUNK_CELLS = 1000000
+
 def mean(s):
     """
     returns mean of the pandas series
@@ -43,9 +56,9 @@ def max_block(s, window = default_window):
     ----------
     s : pd.Series
         Time series.
-    window : int, timedelta, str, offset, optional
+    window : timedelta, str, optional
         Pandas time window. The default is '1H'. 
-        e.g. 1 hour is '1H', 5 min is '5T' or '5min'
+        e.g. 1 hour is '1H', 5 min is '5min'
 
     Returns
     -------
@@ -53,14 +66,34 @@ def max_block(s, window = default_window):
         Maximums of series, rolling averaged.
 
     """
-    s = s.rolling(window).mean()
-    s = s[(s.index[0] + pd.Timedelta(window)):]
-    return s.max()
+    return rolling_block_stats(s, [window])[f'max_{window}']
 
 def min_block(s, window = default_window):
-    s = s.rolling(window).mean()
-    s = s[(s.index[0] + pd.Timedelta(window)):]
-    return s.min()
+    return rolling_block_stats(s, [window])[f'min_{window}']
+
+def rolling_block_stats(s, windows=None):
+    """
+    returns maximums and minimums of rolling averages for several windows. 
+    one prefix sum of the series is shared by all windows.
+
+    Parameters
+    ----------
+    s : pd.Series
+        Time series with DatetimeIndex.
+    windows : list of str, optional
+        Pandas time windows, e.g. ['15min', '1H', '6H', '24H']. 
+        The default is block_windows.
+
+    Returns
+    -------
+    dict
+        'max_<window>' for all windows, then 'min_<window>' for all windows.
+
+    """
+    if windows is None:
+        windows = block_windows
+    return get_stats(s, [f'max_{window}' for window in windows] + 
+                        [f'min_{window}' for window in windows])
 
 def integral_block(s, window = default_window):
     """
@@ -81,25 +114,42 @@ def integral_block(s, window = default_window):
         time series of integrals
 
     """
-    if type(s.index) == pd.core.indexes.datetimes.DatetimeIndex:
-        original_index = s.index
-        s_index = s.reset_index(level=0)
-        s_index = s_index - s_index.shift(1)
-        s_index = s_index.iloc[:, 0].apply(lambda x: x.total_seconds())
-        s = (s + s.shift(1))/2
-        s = s.reset_index(drop=True)
-        s = s.multiply(s_index, fill_value=0)
-        s.index = original_index
-        s = s.resample(window, closed = 'right').sum()
-        return s.iloc[1:]
-    else:
+    if not isinstance(s.index, pd.DatetimeIndex):
         return np.nan
+    values = s.to_numpy(dtype=np.float64).reshape(-1, 1)
+    if values.shape[0] < 2:
+        return pd.Series([], index=pd.DatetimeIndex([], tz=s.index.tz), 
+                         name=s.name, dtype=np.float64)
+
+    index_ns = _index_to_ns(s.index)
+    products = _trapezoid(values, np.diff(index_ns) / 1e9)
+    sums, labels = _window_sums(products, s.index, window)
+    return pd.Series(sums[:, 0], index=labels, name=s.name)
 
 def integral(s):
-    if s.size == 0:
-        return np.nan
-    s = integral_block(s)
-    return np.nan if s is np.nan else s.sum()
+    return integral_stats(s)['integral']
+
+def integral_stats(s):
+    """
+    returns integral, positive_duration and negative_duration of the series
+    from one trapezoidal integration over the time axis
+
+    Parameters
+    ----------
+    s : pd.Series
+        Time series.
+
+    Returns
+    -------
+    dict
+        integral in unit of quantity x second, durations in seconds. NaN if
+        the series is empty or its index is not a DatetimeIndex.
+
+    """
+    stat_names = ['integral', 'positive_duration', 'negative_duration']
+    if s.size == 0 or not isinstance(s.index, pd.DatetimeIndex):
+        return {name: np.nan for name in stat_names}
+    return get_stats(s, stat_names)
 
 def last_timestep(s):
     return s.iloc[-1]
@@ -121,26 +171,419 @@ def positive_duration(s):
         time in seconds.
 
     """
-    s = s.map(lambda x: 1 if x > 0 else 0)
-    return integral(s)
+    return integral_stats(s)['positive_duration']
 
 def negative_duration(s):
-    s = s.map(lambda x: 1 if x < 0 else 0)
-    return integral(s)
+    return integral_stats(s)['negative_duration']
     
+# -------------------------
+# Statistics registry
+# -------------------------
+
+@dataclass(frozen=True)
+class Statistic:
+    """
+    a statistic or a shared intermediate result. func takes a _StatsContext
+    and returns one value per column (intermediates may return anything). 
+    cost is the relative number of passes over the data. requires lists 
+    the intermediates func gets from the context.
+    """
+    name: str
+    func: Callable
+    cost: int = 1
+    requires: tuple = ()
+
+# statistic name -> Statistic
+STATISTICS = {}
+# intermediate name -> Statistic, shared by the statistics that require it
+INTERMEDIATES = {}
+
+def register_statistic(name, func, cost=1, requires=()):
+    STATISTICS[name] = Statistic(name, func, cost, tuple(requires))
+
+def register_intermediate(name, func, cost=1, requires=()):
+    INTERMEDIATES[name] = Statistic(name, func, cost, tuple(requires))
+
+def get_default_stat_names():
+    """
+    statistics of get_all_stats, in output order
+    """
+    return (['mean', 'max', 'min', 'sum'] 
+            + [f'max_{window}' for window in block_windows]
+            + [f'min_{window}' for window in block_windows]
+            + ['integral', 'last_timestep', 
+               'positive_duration', 'negative_duration'])
+
+def get_statistic(name):
+    """
+    returns the registered Statistic. max_<window> and min_<window> are 
+    available for any pandas time window, e.g. max_6H.
+    """
+    if name in STATISTICS:
+        return STATISTICS[name]
+    match = re.fullmatch(r'(max|min)_(.+)', name)
+    if match is not None and _is_window(match.group(2)):
+        func = np.nanmax if match.group(1) == 'max' else np.nanmin
+        rolling_name = f'rolling_mean_{match.group(2)}'
+        return Statistic(
+            name, lambda ctx: _nan_reduce(func, ctx.get(rolling_name)), 
+            1, (rolling_name,))
+    raise ValueError(f"Unknown statistic '{name}'. Available statistics: "
+                     f"{', '.join(STATISTICS)}, max_<window>, min_<window>")
+
+def _get_intermediate(name):
+    if name in INTERMEDIATES:
+        return INTERMEDIATES[name]
+    if name.startswith('rolling_mean_'):
+        window = name[len('rolling_mean_'):]
+        return Statistic(
+            name, lambda ctx: _rolling_mean(
+                *ctx.get('prefix_sums'), ctx.get(f'rolling_bounds_{window}')), 
+            1, ('prefix_sums', f'rolling_bounds_{window}'))
+    if name.startswith('rolling_bounds_'):
+        window = name[len('rolling_bounds_'):]
+        return Statistic(
+            name, lambda ctx: _rolling_bounds(ctx.get('index_ns'), window), 
+            0, ('index_ns',))
+    raise ValueError(f"Unknown intermediate '{name}'")
+
+def _is_window(window):
+    try:
+        _window_to_timedelta(window)
+    except (ValueError, TypeError):
+        return False
+    return True
+
+def _get_requirements(statistic):
+    """
+    all intermediates a statistic needs, directly or through other 
+    intermediates
+    """
+    requirements = []
+    for name in statistic.requires:
+        for required in _get_requirements(_get_intermediate(name)) + [name]:
+            if required not in requirements:
+                requirements.append(required)
+    return requirements
+
+def get_stats_cost(stat_names=None):
+    """
+    relative cost of calculating the statistics together. intermediates 
+    shared by several statistics are counted once.
+    """
+    if stat_names is None:
+        stat_names = get_default_stat_names()
+    statistics = [get_statistic(name) for name in stat_names]
+    intermediates = {name for statistic in statistics 
+                     for name in _get_requirements(statistic)}
+    # sum is shadowed by this module
+    return (builtins.sum(statistic.cost for statistic in statistics) + 
+            builtins.sum(_get_intermediate(name).cost for name in intermediates))
+
+def validate_stat_names(stat_names):
+    """
+    raises ValueError for unknown statistic names
+    """
+    for name in stat_names:
+        get_statistic(name)
+
+def select_stat_names(selection, element_type, quantity_id):
+    """
+    statistics selected for an element. the most specific entry of 
+    selection applies: "<element_type>.<quantity>", then "<quantity>", 
+    then "<element_type>", then the default entry None.
+
+    Parameters
+    ----------
+    selection : dict or None
+        selector -> list of statistic names. None or missing entries select
+        all default statistics.
+    element_type : str
+        element type, e.g. node, link, weir.
+    quantity_id : str
+        quantity ID, e.g. Discharge.
+
+    Returns
+    -------
+    tuple or None
+        selected statistic names, or None for get_default_stat_names().
+
+    """
+    if not selection:
+        return None
+    element_type = str(element_type).lower()
+    quantity_id = str(quantity_id).lower()
+    lookup = {(None if selector is None else str(selector).lower()): names
+              for selector, names in selection.items()}
+    for selector in [f'{element_type}.{quantity_id}', quantity_id, 
+                     element_type, None]:
+        if selector in lookup:
+            names = lookup[selector]
+            return None if names is None else tuple(names)
+    return None
+
+class _StatsContext:
+    """
+    values and time axis of a block with lazily calculated intermediates.
+    intermediates of the time axis only are kept in index_cache, shared by 
+    the contexts of all column chunks of a block.
+    """
+
+    def __init__(self, values, index, index_cache=None):
+        self.values = values
+        self.index = index
+        self._cache = {}
+        self._index_cache = {} if index_cache is None else index_cache
+
+    def get(self, name):
+        if name in self._index_cache:
+            return self._index_cache[name]
+        if name not in self._cache:
+            value = _get_intermediate(name).func(self)
+            if _is_index_intermediate(name):
+                self._index_cache[name] = value
+                return value
+            self._cache[name] = value
+        return self._cache[name]
+
+    def release(self, name):
+        self._cache.pop(name, None)
+
+def _is_index_intermediate(name):
+    return (name in ('index_ns', 'integral_steps') 
+            or name.startswith('rolling_bounds_'))
+
+def get_stats_block(values, index, stat_names=None, columns=None):
+    """
+    returns the selected statistics of every column of a 2-D block sharing
+    one time axis. only the selected statistics and the intermediates they
+    require are calculated, each intermediate once. columns are processed 
+    in chunks of at most CHUNK_CELLS cells, so memory does not grow with 
+    the block. results match get_all_stats of each column within floating 
+    point tolerance.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        2-D array, one row per time step and one column per time series.
+    index : pd.DatetimeIndex
+        monotonic increasing time axis shared by all columns.
+    stat_names : list of str, optional
+        statistics to calculate. The default is get_default_stat_names().
+    columns : array-like of int, optional
+        positions of the columns of values to calculate statistics of. The 
+        default is None, i.e. all columns.
+
+    Raises
+    ------
+    ValueError
+        the block is empty, or index is not a monotonic increasing 
+        DatetimeIndex with one time stamp per row.
+
+    Returns
+    -------
+    dict
+        one array of column statistics per statistic name.
+
+    """
+    if stat_names is None:
+        stat_names = get_default_stat_names()
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values.reshape(-1, 1)
+    if values.shape[0] == 0:
+        raise ValueError("cannot calculate statistics of an empty block")
+    if not isinstance(index, pd.DatetimeIndex):
+        raise ValueError("statistics require a DatetimeIndex, got "
+                         f"{type(index).__name__}")
+    if len(index) != values.shape[0]:
+        raise ValueError(f"index has {len(index)} time stamps for "
+                         f"{values.shape[0]} rows")
+    if not index.is_monotonic_increasing:
+        raise ValueError("statistics require a monotonic increasing "
+                         "DatetimeIndex")
+    if columns is None:
+        columns = np.arange(values.shape[1])
+
+    statistics = [get_statistic(name) for name in stat_names]
+    requirements = [_get_requirements(statistic) for statistic in statistics]
+    # release intermediates after their last use
+    uses = {}
+    for names in requirements:
+        for name in names:
+            uses[name] = uses.get(name, 0) + 1
+
+    chunk_columns = builtins.max(1, CHUNK_CELLS // values.shape[0])
+    index_cache = {}
+    chunks = {statistic.name: [] for statistic in statistics}
+    for start in range(0, builtins.max(1, len(columns)), chunk_columns):
+        ctx = _StatsContext(
+            np.asarray(values[:, columns[start:start + chunk_columns]], 
+                       dtype=np.float64), 
+            index, index_cache)
+        chunk_uses = dict(uses)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for statistic, names in zip(statistics, requirements):
+                chunks[statistic.name].append(statistic.func(ctx))
+                for name in names:
+                    chunk_uses[name] -= 1
+                    if chunk_uses[name] == 0:
+                        ctx.release(name)
+    return {name: np.concatenate(values) for name, values in chunks.items()}
+
+def get_all_stats_block(values, index):
+    """
+    returns all default statistics of every column of a 2-D block, same 
+    keys as get_all_stats. see get_stats_block.
+    """
+    return get_stats_block(values, index)
+
+def get_stats(s, stat_names=None):
+    """
+    returns the selected statistics of a time series. see get_stats_block.
+    """
+    stats = get_stats_block(s.to_numpy(dtype=np.float64).reshape(-1, 1), 
+                            s.index, stat_names)
+    return {name: values[0] for name, values in stats.items()}
+
+def _prefix_sums(ctx):
+    valid = ~np.isnan(ctx.values)
+    shape = (ctx.values.shape[0] + 1, ctx.values.shape[1])
+    cumsum = np.zeros(shape)
+    np.cumsum(np.where(valid, ctx.values, 0.0), axis=0, out=cumsum[1:])
+    counts = np.zeros(shape)
+    np.cumsum(valid, axis=0, out=counts[1:])
+    return cumsum, counts
+
+def _integral_steps(ctx):
+    """
+    time step lengths in seconds, and time steps after the first window of
+    integral_block
+    """
+    _, bins = _window_bins(ctx.index, default_window)
+    included = bins[1:] > 0
+    seconds = np.diff(ctx.get('index_ns'))[included] / 1e9
+    return seconds, included
+
+def _integral_of(values, ctx):
+    if values.shape[0] < 2:
+        return np.zeros(values.shape[1])
+    seconds, included = ctx.get('integral_steps')
+    return _trapezoid(values, seconds, included).sum(axis=0)
+
+register_intermediate('index_ns', lambda ctx: _index_to_ns(ctx.index), 0)
+register_intermediate('prefix_sums', _prefix_sums, 2)
+register_intermediate('integral_steps', _integral_steps, 1, ('index_ns',))
+register_intermediate(
+    'positive_mask', lambda ctx: (ctx.values > 0).astype(np.float64), 1)
+register_intermediate(
+    'negative_mask', lambda ctx: (ctx.values < 0).astype(np.float64), 1)
+
+register_statistic('mean', lambda ctx: _nan_reduce(np.nanmean, ctx.values))
+register_statistic('max', lambda ctx: _nan_reduce(np.nanmax, ctx.values))
+register_statistic('min', lambda ctx: _nan_reduce(np.nanmin, ctx.values))
+register_statistic('sum', lambda ctx: np.nansum(ctx.values, axis=0))
+register_statistic(
+    'integral', lambda ctx: _integral_of(ctx.values, ctx), 
+    2, ('integral_steps',))
+register_statistic(
+    'last_timestep', lambda ctx: ctx.values[-1, :].copy(), 0)
+register_statistic(
+    'positive_duration', 
+    lambda ctx: _integral_of(ctx.get('positive_mask'), ctx), 
+    2, ('positive_mask', 'integral_steps'))
+register_statistic(
+    'negative_duration', 
+    lambda ctx: _integral_of(ctx.get('negative_mask'), ctx), 
+    2, ('negative_mask', 'integral_steps'))
+
+def _index_to_ns(index):
+    return np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+
+def _nan_reduce(func, values):
+    """
+    column reduction that skips NaN. all-NaN or empty columns give NaN,
+    the same as pandas.
+    """
+    if values.shape[0] == 0:
+        return np.full(values.shape[1], np.nan)
+    result = np.full(values.shape[1], np.nan)
+    valid = ~np.isnan(values).all(axis=0)
+    if valid.any():
+        result[valid] = func(values[:, valid], axis=0)
+    return result
+
+def _window_to_timedelta(window):
+    if isinstance(window, str):
+        # lower case, as pandas deprecates 'H'
+        window = window.lower()
+    return pd.Timedelta(window)
+
+def _rolling_bounds(index_ns, window):
+    """
+    prefix sum positions of the start and the end of every rolling window 
+    of _rolling_mean. windows are (t - window, t], the first window is 
+    dropped.
+    """
+    window_ns = _window_to_timedelta(window).value
+    starts = np.searchsorted(index_ns, index_ns - window_ns, side='right')
+    first = np.searchsorted(index_ns, index_ns[0] + window_ns, side='left')
+    return starts[first:], np.arange(first, len(index_ns)) + 1
+
+def _rolling_mean(cumsum, counts, bounds):
+    """
+    time based rolling mean of every column from prefix sums, same as 
+    s.rolling(window).mean() followed by dropping the first window.
+    NaN values are skipped.
+    """
+    window_starts, ends = bounds
+    return ((cumsum[ends] - cumsum[window_starts]) /
+            (counts[ends] - counts[window_starts]))
+
+def _window_bins(index, window):
+    """
+    labels of the resample windows of integral_block and the window 
+    position of every time step. fixed length windows are closed on the 
+    right and aligned to midnight of the first day, as pandas resample. 
+    other offsets are left to pandas.
+    """
+    offset = pd.tseries.frequencies.to_offset(window)
+    if not isinstance(offset, pd.offsets.Tick):
+        counts = pd.Series(np.ones(len(index)), index=index).resample(
+            window, closed='right').count()
+        return counts.index, np.repeat(np.arange(len(counts)), counts.to_numpy())
+
+    window_ns = pd.Timedelta(offset).value
+    origin = index[0].normalize().value
+    start = origin + (-(-(index[0].value - origin) // window_ns) - 1) * window_ns
+    bins = -(-(_index_to_ns(index) - start) // window_ns) - 1
+    labels = pd.date_range(pd.Timestamp(start, tz='UTC').tz_convert(index.tz),
+                           periods=bins[-1] + 1, freq=offset, unit=index.unit)
+    return labels, bins
+
+def _trapezoid(values, seconds, steps=slice(None)):
+    """
+    trapezoid areas of each time step and column. steps selects the time
+    steps by their end point. NaN areas count as zero.
+    """
+    averages = (values[1:][steps] + values[:-1][steps]) / 2
+    products = averages * seconds[:, None]
+    products[np.isnan(products)] = 0.0
+    return products
+
+def _window_sums(products, index, window):
+    """
+    sums of trapezoid areas per resample window, closed on the right. the 
+    first window is dropped, as in the original resample based version. 
+    returns the sums and the window labels.
+    """
+    labels, bins = _window_bins(index, window)
+    sums = np.empty((len(labels), products.shape[1]))
+    for k in range(products.shape[1]):
+        sums[:, k] = np.bincount(bins[1:], weights=products[:, k], 
+                                 minlength=len(labels))
+    return sums[1:], labels[1:]
+
 def get_all_stats(s):
-    return {
-        'mean': mean(s), 
-        'max': max(s),
-        'min': min(s),
-        'sum': sum(s),
-        'max_1H': max_block(s),
-        'max_24H': max_block(s, '1D'),
-        'min_1H': min_block(s),
-        'min_24H': min_block(s, '1D'),
-        'integral': integral(s),
-        'last_timestep': last_timestep(s),
-        'positive_duration': positive_duration(s),
-        'negative_duration': negative_duration(s)
-        }
+    return get_stats(s)
     
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Author: Yi Wang
+# this module keeps extracted time series in shared columnar blocks.
+# one block holds a 2-D array (time x element) and one DatetimeIndex per
+# res1d file and quantity. elements keep a column reference into a block and
+# get their time series as views.
+
+from __future__ import annotations
+
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class TimeSeriesBlock:
+
+    __slots__ = ('_values', '_index', '_columns')
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        index: pd.Index,
+        columns: Optional[pd.Index] = None,
+    ) -> None:
+        values = np.asarray(values)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        if values.shape[0] != len(index):
+            raise ValueError("values and index lengths do not match")
+        # shared by many elements, so views must not modify it
+        values.flags.writeable = False
+
+        self._values: np.ndarray = values
+        self._index: pd.Index = index
+        self._columns: Optional[pd.Index] = columns
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TimeSeriesBlock":
+        return cls(df.to_numpy(), df.index, df.columns)
+
+    @classmethod
+    def from_series(cls, s: pd.Series, copy: bool = True) -> "TimeSeriesBlock":
+        return cls(s.to_numpy(copy=copy), s.index, pd.Index([s.name]))
+
+    def get_values(self) -> np.ndarray:
+        return self._values
+
+    def get_index(self) -> pd.Index:
+        return self._index
+
+    def get_column_count(self) -> int:
+        return self._values.shape[1]
+
+    def get_column_position(self, label: Hashable) -> Optional[int]:
+        if self._columns is None:
+            return None
+        position = self._columns.get_loc(label)
+        return position if isinstance(position, int) else None
+
+    def get_series(self, column: int) -> pd.Series:
+        name = None if self._columns is None else self._columns[column]
+        return pd.Series(self._values[:, column], index=self._index,
+                         name=name, copy=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self._values.nbytes
+
+    def __repr__(self) -> str:
+        return (f"<TimeSeriesBlock {self._values.shape[0]} x "
+                f"{self._values.shape[1]}>")
+
+
+class TimeSeriesColumn:
+
+    __slots__ = ('_block', '_column')
+
+    def __init__(self, block: TimeSeriesBlock, column: int = 0) -> None:
+        if not 0 <= column < block.get_column_count():
+            raise IndexError(f"column {column} is out of range")
+        self._block: TimeSeriesBlock = block
+        self._column: int = column
+
+    def get_block(self) -> TimeSeriesBlock:
+        return self._block
+
+    def get_column(self) -> int:
+        return self._column
+
+    def get_series(self) -> pd.Series:
+        return self._block.get_series(self._column)
+
+    def __repr__(self) -> str:
+        return f"<TimeSeriesColumn {self._column} of {self._block!r}>"